@@ -83,6 +83,7 @@ _RANGE_CONSTRAINTS: dict[str, tuple[float | int | None, float | int | None]] = {
     "db_prune_interval_s":          (60, 86400),
     "rate_limit_prune_age_s":       (60, 86400),
     "queue_check_interval_s":       (1, 300),
+    "queue_idle_check_interval_s":  (10, 3600),
 
     # State machine internals
     "ghost_player_age_s":           (5, 600),
@@ -92,7 +93,6 @@ _RANGE_CONSTRAINTS: dict[str, tuple[float | int | None, float | int | None]] = {
 
     # GPIO executor timeouts
     "gpio_op_timeout_s":            (0.5, 30),
-    "gpio_pulse_timeout_s":         (0.5, 30),
     "gpio_init_timeout_s":          (1, 60),
 
     # GPIO executor circuit breaker
@@ -115,6 +115,7 @@ _RANGE_CONSTRAINTS: dict[str, tuple[float | int | None, float | int | None]] = {
     "wled_pool_timeout_s":          (0.1, 30),
     "wled_http_retries":            (0, 5),
     "wled_retry_backoff_seconds":   (0, 5),
+    "wled_dedup_window_ms":         (0, 2000),
 
     # Watchdog
     "watchdog_check_interval_s":    (1, 60),
@@ -149,7 +150,7 @@ _CONFIG_META: dict[str, dict[str, Any]] = {
     "coin_each_try":             {"cat": "GPIO Pulse/Hold", "label": "Coin Each Try",           "desc": "Credit a coin at the start of each try (vs. only the first)."},
 
     # -- Control --
-    "command_rate_limit_hz":     {"cat": "Control",      "label": "Command Rate Limit (Hz)",    "desc": "Max player control commands per second."},
+    "command_rate_limit_hz":     {"cat": "Control",      "label": "Command Rate Limit (Hz)",    "desc": "Sustained max player direction commands per second. Short bursts of quick taps are allowed."},
     "direction_conflict_mode":   {"cat": "Control",      "label": "Direction Conflict Mode",    "desc": "How to handle opposing directions: ignore_new or replace.", "options": ["ignore_new", "replace"]},
 
     # -- GPIO Pins --
@@ -201,7 +202,7 @@ _CONFIG_META: dict[str, dict[str, Any]] = {
     "max_status_viewers":        {"cat": "WebSocket",    "label": "Max Status Viewers",         "desc": "Maximum concurrent WebSocket status viewers. Takes effect on new connections; existing viewers are not disconnected."},
     "status_send_timeout_s":     {"cat": "WebSocket",    "label": "Status Send Timeout (s)",    "desc": "Per-client send timeout for status broadcasts."},
     "status_keepalive_interval_s":{"cat": "WebSocket",   "label": "Status Keepalive (s)",       "desc": "Seconds between keepalive pings for viewers."},
-    "max_control_connections":   {"cat": "WebSocket",    "label": "Max Control Connections",    "desc": "Maximum concurrent player control channels. Requires restart to resize.", "restart": True},
+    "max_control_connections":   {"cat": "WebSocket",    "label": "Max Control Connections",    "desc": "Maximum concurrent player control channels."},
     "control_send_timeout_s":    {"cat": "WebSocket",    "label": "Control Send Timeout (s)",   "desc": "Per-client send timeout for control messages."},
     "control_ping_interval_s":   {"cat": "WebSocket",    "label": "Control Ping Interval (s)",  "desc": "Seconds between pings on control channels."},
     "control_liveness_timeout_s":{"cat": "WebSocket",    "label": "Control Liveness Timeout (s)","desc": "Seconds before an unresponsive player is disconnected."},
@@ -233,6 +234,7 @@ _CONFIG_META: dict[str, dict[str, Any]] = {
     "db_prune_interval_s":       {"cat": "Background",   "label": "DB Prune Interval (s)",      "desc": "Seconds between automatic DB prune runs."},
     "rate_limit_prune_age_s":    {"cat": "Background",   "label": "Rate Limit Prune Age (s)",   "desc": "Age in seconds after which rate limit entries are pruned."},
     "queue_check_interval_s":    {"cat": "Background",   "label": "Queue Check Interval (s)",   "desc": "Seconds between periodic queue safety checks."},
+    "queue_idle_check_interval_s":{"cat": "Background",  "label": "Idle Queue Check Interval (s)","desc": "Seconds between queue safety checks while idle with an empty queue."},
 
     # -- State Machine Internals --
     "ghost_player_age_s":        {"cat": "State Machine","label": "Ghost Player Age (s)",       "desc": "Seconds before a ghost player entry is cleaned up."},
@@ -242,7 +244,6 @@ _CONFIG_META: dict[str, dict[str, Any]] = {
 
     # -- GPIO Executor Timeouts --
     "gpio_op_timeout_s":         {"cat": "GPIO Timeouts","label": "GPIO Op Timeout (s)",        "desc": "Timeout for normal GPIO operations.", "restart": True},
-    "gpio_pulse_timeout_s":      {"cat": "GPIO Timeouts","label": "GPIO Pulse Timeout (s)",     "desc": "Timeout for GPIO pulse operations.", "restart": True},
     "gpio_init_timeout_s":       {"cat": "GPIO Timeouts","label": "GPIO Init Timeout (s)",      "desc": "Timeout for GPIO initialization.", "restart": True},
 
     # -- WLED Integration --
@@ -263,6 +264,7 @@ _CONFIG_META: dict[str, dict[str, Any]] = {
     "wled_pool_timeout_s":       {"cat": "WLED",         "label": "Pool Timeout (s)",             "desc": "Timeout while waiting for an HTTP connection from the client pool."},
     "wled_http_retries":         {"cat": "WLED",         "label": "HTTP Retries",                "desc": "How many times to retry a timed-out WLED request before giving up."},
     "wled_retry_backoff_seconds": {"cat": "WLED",        "label": "Retry Backoff (s)",          "desc": "Delay between WLED timeout retries."},
+    "wled_dedup_window_ms":      {"cat": "WLED",         "label": "Duplicate Preset Window (ms)", "desc": "A preset identical to the one just sent within this window is skipped instead of restarting its effect. 0 = always send."},
 }
 
 
@@ -334,7 +336,7 @@ async def admin_dashboard(request: Request):
 
     return {
         "uptime_seconds": uptime,
-        "game_state": sm.state.value,
+        "game_state": sm.state.label,
         "paused": sm._paused,
         "gpio_locked": gpio.is_locked,
         "win_sensor_enabled": settings.win_sensor_enabled,
@@ -504,6 +506,11 @@ async def admin_update_config(request: Request):
         else:
             applied.append(key)
 
+    # The WLED client works from a snapshot of its settings
+    wled = getattr(request.app.state, "wled_client", None)
+    if wled is not None and any(k.startswith("wled_") for k in coerced):
+        wled.refresh_settings()
+
     _admin_logger.info(
         "Config updated via admin panel: applied=%s, restart_needed=%s",
         applied, restart_needed,
@@ -623,11 +630,7 @@ async def admin_kick_player(entry_id: str, request: Request):
     if need_broadcast:
         # Broadcast updated queue so viewer/admin dashboards stay in sync
         status = await qm.get_queue_status()
-        entries = await qm.list_queue()
-        queue_entries = [
-            {"name": e["name"], "state": e["state"], "position": e["position"]}
-            for e in entries
-        ]
+        queue_entries = await qm.get_cached_payload()
         await request.app.state.ws_hub.broadcast_queue_update(status, queue_entries)
 
         # Advance queue in case a waiting player should now be promoted
@@ -278,11 +278,7 @@ async def queue_join(body: JoinRequest, request: Request):
 
     # Broadcast updated queue to all viewers
     status = await qm.get_queue_status()
-    entries = await qm.list_queue()
-    queue_entries = [
-        {"name": e["name"], "state": e["state"], "position": e["position"]}
-        for e in entries
-    ]
+    queue_entries = await qm.get_cached_payload()
     await request.app.state.ws_hub.broadcast_queue_update(status, queue_entries)
 
     # Compute wait from actual queue rank, not raw position which
@@ -331,11 +327,7 @@ async def queue_leave(request: Request, authorization: str = Header(...)):
 
         # Broadcast updated queue to all viewers
         status = await qm.get_queue_status()
-        entries = await qm.list_queue()
-        queue_entries = [
-            {"name": e["name"], "state": e["state"], "position": e["position"]}
-            for e in entries
-        ]
+        queue_entries = await qm.get_cached_payload()
         await request.app.state.ws_hub.broadcast_queue_update(status, queue_entries)
     else:
         left = await qm.leave(token_hash)
@@ -344,11 +336,7 @@ async def queue_leave(request: Request, authorization: str = Header(...)):
 
         # Broadcast updated queue to all viewers
         status = await qm.get_queue_status()
-        entries = await qm.list_queue()
-        queue_entries = [
-            {"name": e["name"], "state": e["state"], "position": e["position"]}
-            for e in entries
-        ]
+        queue_entries = await qm.get_cached_payload()
         await request.app.state.ws_hub.broadcast_queue_update(status, queue_entries)
 
     return {"ok": True}
@@ -407,7 +395,7 @@ async def queue_list(request: Request):
         entries=result_entries,
         total=len(entries),
         current_player=current_player,
-        game_state=sm.state.value,
+        game_state=sm.state.label,
     )
 
 
@@ -468,7 +456,7 @@ async def health(request: Request):
 
     return HealthResponse(
         status="ok",
-        game_state=sm.state.value,
+        game_state=sm.state.label,
         gpio_locked=gpio.is_locked,
         camera_ok=camera_ok,
         queue_length=(await qm.get_queue_status())["queue_length"],
@@ -0,0 +1,12 @@
+"""Clock — shared monotonic time source for deadlines and cooldowns."""
+
+import functools
+import time
+
+# Deadlines and cooldowns only need millisecond precision.  On Linux the
+# coarse clock is served from the last tick without reading the hardware
+# counter; it shares time.monotonic()'s epoch, so values stay comparable.
+if hasattr(time, "CLOCK_MONOTONIC_COARSE"):
+    coarse_monotonic = functools.partial(time.clock_gettime, time.CLOCK_MONOTONIC_COARSE)
+else:
+    coarse_monotonic = time.monotonic
@@ -127,6 +127,7 @@ class Settings(BaseSettings):
     wled_pool_timeout_s: float = 2.0
     wled_http_retries: int = 1
     wled_retry_backoff_seconds: float = 0.15
+    wled_dedup_window_ms: int = 100     # Skip re-sending the preset just sent within this window (0 = off)
 
     # DB maintenance: hours to keep completed entries before pruning
     db_retention_hours: int = 48
@@ -179,6 +180,7 @@ class Settings(BaseSettings):
     db_prune_interval_s: int = 3600
     rate_limit_prune_age_s: int = 3600
     queue_check_interval_s: int = 10
+    queue_idle_check_interval_s: int = 300
 
     # -- State machine internals ----------------------------------------------
 
@@ -190,7 +192,6 @@ class Settings(BaseSettings):
     # -- GPIO executor timeouts -----------------------------------------------
 
     gpio_op_timeout_s: float = 2.0
-    gpio_pulse_timeout_s: float = 5.0
     gpio_init_timeout_s: float = 10.0
 
     # -- GPIO executor circuit breaker ----------------------------------------
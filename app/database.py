@@ -117,32 +117,54 @@ async def prune_old_entries(retention_hours: int = 48):
     db = await get_db()
     _ensure_locks()
     async with _write_lock:
-        cutoff = f"-{retention_hours} hours"
-        # Only delete events belonging to completed/cancelled entries older than
-        # the retention window.  Previous code deleted events by created_at alone,
-        # which could remove events for entries still in the queue (e.g. a player
-        # waiting longer than retention_hours at a multi-day event).
-        result_events = await db.execute(
-            "DELETE FROM game_events WHERE queue_entry_id IN ("
-            "  SELECT id FROM queue_entries"
-            "  WHERE state IN ('done', 'cancelled')"
-            "  AND completed_at < datetime('now', ?)"
-            ")",
-            (cutoff,),
-        )
-        result_entries = await db.execute(
-            "DELETE FROM queue_entries WHERE state IN ('done', 'cancelled') "
-            "AND completed_at < datetime('now', ?)",
-            (cutoff,),
+        await _delete_old_entries(db, retention_hours)
+        await db.commit()
+
+
+async def prune_all(retention_hours: int, rate_limit_age_s: int):
+    """Run prune_old_entries() and the rate limit prune in one transaction.
+
+    Used by the periodic maintenance job so both cleanups share a single
+    write-lock acquisition and commit.
+    """
+    db = await get_db()
+    _ensure_locks()
+    async with _write_lock:
+        await _delete_old_entries(db, retention_hours)
+        await db.execute(
+            "DELETE FROM rate_limits WHERE ts < datetime('now', ?)",
+            (f"-{rate_limit_age_s} seconds",),
         )
         await db.commit()
-        events_deleted = result_events.rowcount
-        entries_deleted = result_entries.rowcount
-        if events_deleted or entries_deleted:
-            logger.info(
-                "DB prune: removed %d events, %d completed entries (older than %dh)",
-                events_deleted, entries_deleted, retention_hours,
-            )
+
+
+async def _delete_old_entries(db, retention_hours: int):
+    """Issue the prune_old_entries() DELETEs.  Caller holds _write_lock and commits."""
+    cutoff = f"-{retention_hours} hours"
+    # Only delete events belonging to completed/cancelled entries older than
+    # the retention window.  Previous code deleted events by created_at alone,
+    # which could remove events for entries still in the queue (e.g. a player
+    # waiting longer than retention_hours at a multi-day event).
+    result_events = await db.execute(
+        "DELETE FROM game_events WHERE queue_entry_id IN ("
+        "  SELECT id FROM queue_entries"
+        "  WHERE state IN ('done', 'cancelled')"
+        "  AND completed_at < datetime('now', ?)"
+        ")",
+        (cutoff,),
+    )
+    result_entries = await db.execute(
+        "DELETE FROM queue_entries WHERE state IN ('done', 'cancelled') "
+        "AND completed_at < datetime('now', ?)",
+        (cutoff,),
+    )
+    events_deleted = result_events.rowcount
+    entries_deleted = result_entries.rowcount
+    if events_deleted or entries_deleted:
+        logger.info(
+            "DB prune: removed %d events, %d completed entries (older than %dh)",
+            events_deleted, entries_deleted, retention_hours,
+        )
 
 
 def hash_token(token: str) -> str:
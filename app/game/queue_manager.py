@@ -1,5 +1,6 @@
 """Queue management — CRUD operations for the player queue."""
 
+import asyncio
 import json
 import secrets
 import uuid
@@ -8,8 +9,62 @@ from datetime import datetime, timezone
 from app.database import get_db, hash_token, log_event
 import app.database as _db_mod
 
+# Upper bound on cached token lookups per payload generation.
+_TOKEN_CACHE_MAX = 1024
+
 
 class QueueManager:
+    def __init__(self):
+        # Cached viewer-facing queue payload (name/state/position per entry).
+        # Rebuilt lazily on the next read after any queue write; the
+        # generation counter stops a read that raced a write from storing
+        # a stale snapshot.
+        self._payload_cache: list[dict] | None = None
+        self._payload_gen: int = 0
+        # False once get_waiting_count() has seen zero waiters and no queue
+        # write has happened since, letting idle pollers skip the query.
+        self._waiters_dirty: bool = True
+        # Set on every queue write; wakes the idle queue watcher.
+        self._waiters_event = asyncio.Event()
+        # Last waiting count and the payload generation it was read at;
+        # reused until the next queue write bumps the generation.
+        self._waiting_count: int = 0
+        self._waiting_count_gen: int = -1
+        # get_by_token() results read at _token_cache_gen, so reconnect
+        # storms skip the query until the next queue write.
+        self._token_cache: dict[str, dict | None] = {}
+        self._token_cache_gen: int = -1
+
+    def _invalidate_payload(self):
+        self._payload_cache = None
+        self._payload_gen += 1
+        self._waiters_dirty = True
+        self._waiters_event.set()
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every queue write.  Two equal reads mean the
+        queue was not written to in between."""
+        return self._payload_gen
+
+    @property
+    def maybe_has_waiters(self) -> bool:
+        """False only if get_waiting_count() last saw zero waiters and the
+        queue has not been written to since."""
+        return self._waiters_dirty
+
+    async def wait_for_write(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for the next queue write.
+
+        Returns True if one happened, False on timeout.
+        """
+        self._waiters_event.clear()
+        try:
+            await asyncio.wait_for(self._waiters_event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
     async def join(self, name: str, email: str, ip: str) -> dict:
         """Add a user to the queue. Returns {id, token, position}.
 
@@ -57,6 +112,7 @@ class QueueManager:
             )
 
             await db.commit()
+            self._invalidate_payload()
 
         # Read back the assigned position
         async with db.execute(
@@ -91,6 +147,7 @@ class QueueManager:
                 (token_hash,),
             )
             await db.commit()
+            self._invalidate_payload()
 
         await log_event(entry_id, "leave")
         return True
@@ -116,6 +173,7 @@ class QueueManager:
                 (state, activated_at, entry_id),
             )
             await db.commit()
+            self._invalidate_payload()
 
         await log_event(entry_id, f"state_{state}")
 
@@ -129,17 +187,35 @@ class QueueManager:
                 (result, tries_used, entry_id),
             )
             await db.commit()
+            self._invalidate_payload()
 
         await log_event(entry_id, "turn_end", json.dumps({"result": result, "tries": tries_used}))
 
     async def get_by_token(self, token_hash: str) -> dict | None:
-        """Look up a queue entry by token hash."""
+        """Look up a queue entry by token hash.
+
+        Results are reused until the next queue write bumps the payload
+        generation, so callers must not mutate the returned dict.  Finished
+        entries are not cached since pruning deletes them outside this class.
+        """
+        gen = self._payload_gen
+        cache = self._token_cache
+        if self._token_cache_gen != gen:
+            cache.clear()
+            self._token_cache_gen = gen
+        elif token_hash in cache:
+            return cache[token_hash]
         db = await get_db()
         async with db.execute(
             "SELECT * FROM queue_entries WHERE token_hash = ?", (token_hash,)
         ) as cur:
             row = await cur.fetchone()
-            return dict(row) if row else None
+            entry = dict(row) if row else None
+        if gen == self._payload_gen and (entry is None or entry["state"] not in ("done", "cancelled")):
+            if len(cache) >= _TOKEN_CACHE_MAX:
+                del cache[next(iter(cache))]
+            cache[token_hash] = entry
+        return entry
 
     async def get_by_id(self, entry_id: str) -> dict | None:
         """Look up a queue entry by ID."""
@@ -193,6 +269,7 @@ class QueueManager:
                 "WHERE state = 'ready'"
             )
             await db.commit()
+            self._invalidate_payload()
 
     async def list_queue(self) -> list[dict]:
         """Return all active queue entries (waiting, ready, active) ordered by position."""
@@ -207,6 +284,36 @@ class QueueManager:
             rows = await cur.fetchall()
             return [dict(r) for r in rows]
 
+    async def list_queue_snapshot(self) -> list[dict]:
+        """Return only name/state/position for active queue entries.
+
+        Same ordering as list_queue(), but the projection is done in SQL so
+        each row becomes the broadcast dict in a single pass.
+        """
+        db = await get_db()
+        async with db.execute(
+            "SELECT name, state, position "
+            "FROM queue_entries WHERE state IN ('waiting', 'ready', 'active') "
+            "ORDER BY CASE state "
+            "  WHEN 'active' THEN 0 WHEN 'ready' THEN 1 WHEN 'waiting' THEN 2 END, "
+            "position ASC"
+        ) as cur:
+            return [dict(r) for r in await cur.fetchall()]
+
+    async def get_cached_payload(self) -> list[dict]:
+        """Return the viewer-facing queue entries for ``queue_update`` broadcasts.
+
+        Same rows as list_queue_snapshot().  The list is cached until the
+        next queue write, so callers must not mutate it.
+        """
+        if self._payload_cache is not None:
+            return self._payload_cache
+        gen = self._payload_gen
+        payload = await self.list_queue_snapshot()
+        if gen == self._payload_gen:
+            self._payload_cache = payload
+        return payload
+
     async def list_queue_admin(self) -> list[dict]:
         """Return all active queue entries with admin-visible fields.
 
@@ -280,9 +387,23 @@ class QueueManager:
         return stats
 
     async def get_waiting_count(self) -> int:
-        """Get count of waiting players."""
+        """Get count of waiting players.
+
+        Every queue write goes through this class and bumps the payload
+        generation, so a count read at the current generation is still
+        exact and is returned without querying.
+        """
+        gen = self._payload_gen
+        if self._waiting_count_gen == gen:
+            return self._waiting_count
         db = await get_db()
         async with db.execute(
             "SELECT COUNT(*) FROM queue_entries WHERE state = 'waiting'"
         ) as cur:
-            return (await cur.fetchone())[0]
+            count = (await cur.fetchone())[0]
+        if gen == self._payload_gen:
+            self._waiting_count = count
+            self._waiting_count_gen = gen
+            if count == 0:
+                self._waiters_dirty = False
+        return count
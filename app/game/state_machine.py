@@ -2,19 +2,50 @@
 
 import asyncio
 import logging
+import sqlite3
 import time
-from enum import Enum
+from datetime import datetime, timezone
+from enum import IntEnum
+
+from app.clock import coarse_monotonic
+from app.database import get_db
+import app.database as _db_mod
 
 logger = logging.getLogger("state_machine")
 
+# Turn result -> WLED event fired by _end_turn.  Results not listed here
+# (skipped, cancelled, admin_skipped, ...) leave the strip untouched.
+_RESULT_WLED_EVENTS = {"win": "win", "loss": "loss", "expired": "expire"}
+
+
+class TurnState(IntEnum):
+    """Turn states.  Integer-valued so the hot state guards compare small
+    ints; ``label`` is the lowercase name used on the wire and in logs."""
+
+    IDLE = 0
+    READY_PROMPT = 1
+    MOVING = 2
+    DROPPING = 3
+    POST_DROP = 4
+    TURN_END = 5
+
+    @property
+    def label(self) -> str:
+        return _STATE_LABELS[self]
+
+    def __str__(self) -> str:
+        return _STATE_LABELS[self]
+
+    def __format__(self, spec: str) -> str:
+        return format(_STATE_LABELS[self], spec)
+
+
+_STATE_LABELS = tuple(s.name.lower() for s in TurnState)
 
-class TurnState(str, Enum):
-    IDLE = "idle"
-    READY_PROMPT = "ready_prompt"
-    MOVING = "moving"
-    DROPPING = "dropping"
-    POST_DROP = "post_drop"
-    TURN_END = "turn_end"
+# States in which a turn is in progress (the hard turn timer applies).
+TURN_ACTIVE_STATES = (
+    TurnState.READY_PROMPT, TurnState.MOVING, TurnState.DROPPING, TurnState.POST_DROP,
+)
 
 
 class StateMachine:
@@ -24,16 +55,33 @@ class StateMachine:
         self.ws = ws_hub
         self.ctrl = control_handler
         self.settings = settings
-        self.wled = wled  # Optional WLEDClient — None when WLED is disabled
+        self.wled = wled  # Optional WLEDClient
 
         self.state = TurnState.IDLE
         self.active_entry_id: str | None = None
         self.current_try: int = 0
-        self._state_timer: asyncio.Task | None = None
-        self._turn_timer: asyncio.Task | None = None
+        # Timer slots hold a TimerHandle while armed and the handler Task
+        # once the deadline fires, so cancel() works in either phase.
+        self._state_timer: asyncio.TimerHandle | asyncio.Task | None = None
+        self._turn_timer: asyncio.TimerHandle | asyncio.Task | None = None
         self._paused = False
         self._loop: asyncio.AbstractEventLoop | None = None
-        self._advance_lock = asyncio.Lock()
+        # advance_queue() in-progress guard.  A call that finds an advance
+        # already running returns at once and sets _advance_pending so the
+        # running advance hands off one more pass when it finishes.
+        self._advance_running = False
+        self._advance_pending = False
+
+        # Single long-lived advancer task.  _schedule_advance() just sets the
+        # event, so bursts of triggers coalesce into one advance_queue() run.
+        self._advance_event = asyncio.Event()
+        self._advancer_task: asyncio.Task | None = None
+
+        # Deadline persistence buffer (entry_id -> (move_end, turn_end)),
+        # drained by a lazily started flusher task.
+        self._deadline_buf: dict[str, tuple[str | None, str | None]] = {}
+        self._deadline_wake = asyncio.Event()
+        self._deadline_task: asyncio.Task | None = None
 
         # Serialises all state-mutating operations.  The periodic checker,
         # timer callbacks, and WebSocket handlers all go through this lock
@@ -45,13 +93,22 @@ class StateMachine:
         self._state_deadline: float = 0.0   # deadline for current state timer
         self._turn_deadline: float = 0.0    # deadline for hard turn timeout
 
+        # Last built state payload and the (state, entry, try) it describes.
+        # Only the *_seconds_left fields change between transitions.
+        self._cached_payload: dict | None = None
+        self._cached_payload_key: tuple | None = None
+
         # Track when the last state transition happened so the periodic
         # checker can detect states that have been stuck for too long.
-        self._last_state_change: float = time.monotonic()
+        self._last_state_change: float = coarse_monotonic()
 
         # Prevents concurrent _force_recover calls from piling up.
         self._recovering = False
 
+        # One-shot watchdog armed on entering TURN_END; forces recovery if
+        # the turn cleanup is still stuck after turn_end_stuck_timeout_s.
+        self._turn_end_watchdog: asyncio.TimerHandle | None = None
+
     # -- Public Interface ----------------------------------------------------
 
     async def advance_queue(self):
@@ -62,52 +119,54 @@ class StateMachine:
         timeout.  Players who joined very recently (< 30 s) get the normal
         ready-prompt flow because their WebSocket may still be connecting.
 
-        The ~2 s WebSocket connection wait runs *outside* ``_advance_lock``
-        to minimise lock hold time.  Under burst conditions this prevents
-        the lock from being held for seconds while we poll for a connection.
-        The candidate is re-validated under the lock before any mutation.
+        At most one advance runs at a time: a call that arrives while one is
+        in progress returns immediately and a follow-up pass is scheduled
+        once the running advance finishes.  The ~2 s WebSocket connection
+        wait runs *before* the in-progress guard, so concurrent callers are
+        never turned away for seconds while we wait for a connection.  The
+        candidate is re-validated inside the guarded section before any
+        mutation.
         """
         if self._loop is None:
             self._loop = asyncio.get_running_loop()
 
         # Pre-flight: wait for the likely next candidate's WebSocket
-        # connection *outside* the lock so we don't inflate lock hold time.
-        # This is best-effort — the candidate is re-validated under the lock.
+        # connection *outside* the guarded section so we don't inflate its
+        # duration.  This is best-effort — the candidate is re-validated
+        # below.  Ghost candidates (queued longer than ghost_player_age_s)
+        # are skipped regardless, so waiting on them is pure latency.
         candidate = await self.queue.peek_next_waiting()
-        if candidate and self.ctrl and not self.ctrl.is_player_connected(candidate["id"]):
-            for _ in range(20):  # wait up to ~2 s
-                await asyncio.sleep(0.1)
-                if self.ctrl.is_player_connected(candidate["id"]):
-                    break
-
-        async with self._advance_lock:
+        if (
+            candidate and self.ctrl
+            and not self.ctrl.is_player_connected(candidate["id"])
+            and self._queued_seconds(candidate) <= self.settings.ghost_player_age_s
+        ):
+            await self.ctrl.wait_for_connection(candidate["id"], timeout=2.0)
+
+        if self._advance_running:
+            self._advance_pending = True
+            return
+        # asyncio is single-threaded: nothing can run between the check
+        # above and the assignment below.
+        self._advance_running = True
+        try:
             if self.state != TurnState.IDLE:
                 return
             if self._paused:
                 return
 
+            skipped_any = False
             while True:
                 next_entry = await self.queue.peek_next_waiting()
                 if next_entry is None:
-                    return
+                    break
 
                 # If still not connected, check how long they've been in the
                 # queue.  Players who joined > 30 s ago and have no WebSocket
                 # have almost certainly navigated away — skip them immediately
                 # so the queue drains in seconds, not minutes.
                 if self.ctrl and not self.ctrl.is_player_connected(next_entry["id"]):
-                    from datetime import datetime, timezone
-                    created = next_entry.get("created_at", "")
-                    age_seconds = 999
-                    try:
-                        # SQLite stores as ISO without tz — assume UTC
-                        dt = datetime.fromisoformat(created.replace("Z", "+00:00"))
-                        if dt.tzinfo is None:
-                            dt = dt.replace(tzinfo=timezone.utc)
-                        age_seconds = (datetime.now(timezone.utc) - dt).total_seconds()
-                    except Exception:
-                        pass
-
+                    age_seconds = self._queued_seconds(next_entry)
                     if age_seconds > self.settings.ghost_player_age_s:
                         logger.info(
                             "Skipping disconnected player %s (%s, queued %.0fs ago)",
@@ -115,18 +174,12 @@ class StateMachine:
                         )
                         await self.queue.complete_entry(next_entry["id"], "skipped", 0)
 
-                        # Broadcast the skip to viewers
-                        try:
-                            await self.ws.broadcast_turn_end(next_entry["id"], "skipped")
-                            status = await self.queue.get_queue_status()
-                            entries = await self.queue.list_queue()
-                            queue_entries = [
-                                {"name": e["name"], "state": e["state"], "position": e["position"]}
-                                for e in entries
-                            ]
-                            await self.ws.broadcast_queue_update(status, queue_entries)
-                        except Exception:
-                            logger.exception("Broadcast failed during ghost-player skip (non-fatal)")
+                        # Broadcast the skip to viewers (the hub drops failed
+                        # clients itself, so this does not raise).  The queue
+                        # snapshot is deferred until the skip cascade finishes
+                        # so a run of ghosts costs one queue_update, not one each.
+                        await self.ws.broadcast_turn_end(next_entry["id"], "skipped")
+                        skipped_any = True
 
                         continue  # Try the next waiting player
 
@@ -138,26 +191,28 @@ class StateMachine:
                     # Re-validate: another coroutine may have changed state
                     # while we awaited ghost-player DB operations above.
                     if self.state != TurnState.IDLE:
-                        return
+                        break
 
                     self.active_entry_id = next_entry["id"]
                     await self.queue.set_state(next_entry["id"], "ready")
 
                     # Broadcast updated queue so viewers see the player as READY
-                    try:
-                        status = await self.queue.get_queue_status()
-                        entries = await self.queue.list_queue()
-                        queue_entries = [
-                            {"name": e["name"], "state": e["state"], "position": e["position"]}
-                            for e in entries
-                        ]
-                        await self.ws.broadcast_queue_update(status, queue_entries)
-                    except Exception:
-                        logger.exception("Broadcast failed during ready advancement (non-fatal)")
+                    # (this snapshot also covers any ghosts skipped above).
+                    await self._broadcast_queue_snapshot("ready advancement")
 
                     await self._enter_state(TurnState.READY_PROMPT)
                     return
 
+            # Flush a single coalesced queue update for the ghost players
+            # skipped above — viewers only care about the final state.
+            if skipped_any:
+                await self._broadcast_queue_snapshot("ghost-player skip")
+        finally:
+            self._advance_running = False
+            if self._advance_pending:
+                self._advance_pending = False
+                self._schedule_advance()
+
     async def handle_ready_confirm(self, entry_id: str):
         """Called when the prompted player confirms they are ready."""
         async with self._sm_lock:
@@ -170,9 +225,10 @@ class StateMachine:
             self.current_try = 0
 
             # Start hard turn timer and record its deadline
-            self._turn_deadline = time.monotonic() + self.settings.turn_time_seconds
-            self._turn_timer = asyncio.create_task(
-                self._hard_turn_timeout(self.settings.turn_time_seconds)
+            self._turn_deadline = coarse_monotonic() + self.settings.turn_time_seconds
+            self._arm_timer(
+                "_turn_timer", self.settings.turn_time_seconds,
+                TURN_ACTIVE_STATES, self._hard_turn_timeout,
             )
             await self._start_try()
 
@@ -193,7 +249,7 @@ class StateMachine:
                 return
             logger.info("Drop released by player")
             # Cancel the safety timeout since the player released manually
-            if self._state_timer and not self._state_timer.done():
+            if self._state_timer:
                 self._state_timer.cancel()
             await self.gpio.drop_off()
             self._state_timer = None
@@ -217,7 +273,7 @@ class StateMachine:
                 logger.info("WIN DETECTED")
                 await self._end_turn("win")
             else:
-                logger.warning(f"Win trigger ignored: state is {self.state}")
+                logger.warning("Win trigger ignored: state is %s", self.state)
 
     async def handle_disconnect(self, entry_id: str):
         """Called when active player's WebSocket disconnects."""
@@ -226,7 +282,7 @@ class StateMachine:
         await self.gpio.all_directions_off()
         # Drop is momentary — if we're in DROPPING state, the safety
         # _drop_hold_timeout will auto-release and transition to POST_DROP.
-        logger.info(f"Active player {entry_id} disconnected, directions OFF")
+        logger.info("Active player %s disconnected, directions OFF", entry_id)
 
     async def handle_disconnect_timeout(self, entry_id: str):
         """Called after grace period expires without reconnection."""
@@ -283,40 +339,44 @@ class StateMachine:
         MUST be called while holding _sm_lock (or from a timer callback
         that has already checked its state guard).
         """
-        if self._state_timer and not self._state_timer.done():
+        if self._state_timer:
             self._state_timer.cancel()
 
         old_state = self.state
         self.state = new_state
         self._state_deadline = 0.0  # Reset; set below for timed states
-        self._last_state_change = time.monotonic()
-        logger.info(f"State: {old_state} -> {new_state}")
+        # One clock read per transition: every deadline below is set before
+        # the first await, so they all share the transition timestamp.
+        now = coarse_monotonic()
+        self._last_state_change = now
+        logger.info("State: %s -> %s", old_state, new_state)
 
         if new_state == TurnState.READY_PROMPT:
-            self._state_deadline = time.monotonic() + self.settings.ready_prompt_seconds
-            self._state_timer = asyncio.create_task(
-                self._ready_timeout(self.settings.ready_prompt_seconds)
+            self._state_deadline = now + self.settings.ready_prompt_seconds
+            self._arm_timer(
+                "_state_timer", self.settings.ready_prompt_seconds,
+                (TurnState.READY_PROMPT,), self._ready_timeout,
             )
 
         elif new_state == TurnState.MOVING:
-            self._state_deadline = time.monotonic() + self.settings.try_move_seconds
-            self._state_timer = asyncio.create_task(
-                self._move_timeout(self.settings.try_move_seconds)
+            self._state_deadline = now + self.settings.try_move_seconds
+            self._arm_timer(
+                "_state_timer", self.settings.try_move_seconds,
+                (TurnState.MOVING,), self._move_timeout,
             )
             # Persist deadline to DB for SSOT recovery
-            await self._write_deadlines()
+            self._write_deadlines()
 
         elif new_state == TurnState.DROPPING:
             drop_secs = self.settings.drop_hold_max_ms / 1000.0
-            self._state_deadline = time.monotonic() + drop_secs
+            self._state_deadline = now + drop_secs
             await self.gpio.all_directions_off()
             if self.settings.win_sensor_enabled:
                 self.gpio.register_win_callback(self._win_bridge)
             await self.gpio.drop_on()
-            self._state_timer = asyncio.create_task(
-                self._drop_hold_timeout(drop_secs)
-            )
-            await self._wled_event("drop")
+            self._arm_timer("_state_timer", drop_secs, (TurnState.DROPPING,), self._drop_hold_timeout)
+            if self._wled_enabled:
+                await self._wled_event("drop")
 
         elif new_state == TurnState.POST_DROP:
             # Keep a configurable pause even when the win sensor is disabled
@@ -326,43 +386,40 @@ class StateMachine:
                 if self.settings.win_sensor_enabled
                 else self.settings.post_drop_wait_no_sensor_seconds
             )
-            self._state_deadline = time.monotonic() + wait
+            self._state_deadline = now + wait
             if self.settings.win_sensor_enabled:
                 self.gpio.register_win_callback(self._win_bridge)
             else:
                 # No win sensor — fire a "grab" WLED event so the strip
                 # shows a celebratory effect while the claw returns.
-                await self._wled_event("grab")
-            self._state_timer = asyncio.create_task(
-                self._post_drop_timeout(wait)
-            )
+                if self._wled_enabled:
+                    await self._wled_event("grab")
+            self._arm_timer("_state_timer", wait, (TurnState.POST_DROP,), self._post_drop_timeout)
 
         elif new_state == TurnState.TURN_END:
             pass  # Handled by _end_turn
 
         # Broadcast state to all viewers (after deadlines are set so payload
         # includes accurate remaining-time values)
-        payload = self._build_state_payload()
+        payload = self._cache_state_payload()
         await self.ws.broadcast_state(new_state, payload)
 
-        # Also notify the active player via control channel
+        # Also notify the active player via control channel.  The explicit
+        # ready_prompt goes out in the same batch, after the state_update, so
+        # the client has full context when it renders the prompt.
         if self.active_entry_id and self.ctrl:
-            await self.ctrl.send_to_player(self.active_entry_id, {
-                "type": "state_update", **payload
-            })
-
-        # Send explicit ready_prompt after the state_update so the client
-        # has full context (timeout_seconds is included in the payload now)
-        if new_state == TurnState.READY_PROMPT and self.ctrl:
-            await self.ctrl.send_to_player(self.active_entry_id, {
-                "type": "ready_prompt",
-                "timeout_seconds": self.settings.ready_prompt_seconds,
-            })
+            messages = [{"type": "state_update", **payload}]
+            if new_state == TurnState.READY_PROMPT:
+                messages.append({
+                    "type": "ready_prompt",
+                    "timeout_seconds": self.settings.ready_prompt_seconds,
+                })
+            await self.ctrl.send_batch_to_player(self.active_entry_id, messages)
 
     async def _start_try(self):
         """Begin a new try. Optionally pulse coin, then enter MOVING."""
         self.current_try += 1
-        logger.info(f"Starting try {self.current_try}/{self.settings.tries_per_player}")
+        logger.info("Starting try %d/%d", self.current_try, self.settings.tries_per_player)
 
         if self.settings.coin_each_try:
             for i in range(self.settings.coin_pulses_per_credit):
@@ -370,7 +427,7 @@ class StateMachine:
                 await asyncio.sleep(self.settings.coin_post_pulse_delay_s)  # Let machine register credit
 
         # Fire WLED start_turn on the first try
-        if self.current_try == 1:
+        if self.current_try == 1 and self._wled_enabled:
             await self._wled_event("start_turn")
 
         await self._enter_state(TurnState.MOVING)
@@ -380,10 +437,15 @@ class StateMachine:
 
         IMPORTANT: This method MUST NOT call advance_queue() directly
         because _end_turn is often invoked from timer callbacks that fire
-        while advance_queue() holds _advance_lock (e.g. ready timeout
-        during the advance_queue skipping loop).  Calling advance_queue()
-        inline would deadlock on _advance_lock.  Instead, we schedule it
-        as a fire-and-forget task.
+        while an advance is in progress (e.g. ready timeout during the
+        advance_queue skipping loop), and runs under _sm_lock, which
+        advance_queue's ~2 s connection wait must never hold up.  Instead,
+        we wake the advancer task via _schedule_advance(), a single
+        Event.set().
+
+        MUST be called while holding _sm_lock.  The lock is held for the
+        mutation phase (state, timers, GPIO) but released around the DB /
+        WebSocket notify phase, and held again on return.
         """
         # Guard against re-entry from concurrent timer callbacks.
         # Two timers (e.g. _hard_turn_timeout and _post_drop_timeout) can
@@ -393,15 +455,16 @@ class StateMachine:
             return
         prev_state = self.state
         self.state = TurnState.TURN_END
-        self._last_state_change = time.monotonic()
+        self._last_state_change = coarse_monotonic()
+        self._arm_turn_end_watchdog()
 
-        logger.info(f"Turn ending: result={result}, tries={self.current_try}")
+        logger.info("Turn ending: result=%s, tries=%d", result, self.current_try)
 
         # Cancel timers FIRST, before any await, to prevent the other
         # timer from entering _end_turn during a yield.
-        if self._turn_timer and not self._turn_timer.done():
+        if self._turn_timer:
             self._turn_timer.cancel()
-        if self._state_timer and not self._state_timer.done():
+        if self._state_timer:
             self._state_timer.cancel()
 
         self.gpio.unregister_win_callback()
@@ -429,163 +492,243 @@ class StateMachine:
         # is in a bad state.
         self.gpio._locked = False
 
+        # Snapshot what the notify phase needs and clear the turn now, so
+        # force_end_turn() and disconnect handling see no active player
+        # while the lock is released below.
+        entry_id = self.active_entry_id
+        tries_used = self.current_try
+        self.active_entry_id = None
+        self.current_try = 0
+        self._state_deadline = 0.0
+        self._turn_deadline = 0.0
+
+        # Notify phase: DB writes and WebSocket fan-out run WITHOUT holding
+        # _sm_lock.  State stays TURN_END, so any handler or timer that takes
+        # the lock meanwhile sees a non-actionable state and returns at once.
+        # The caller's ``async with`` still expects to own the lock when we
+        # return, so it is re-acquired before the final reset.
+        self._sm_lock.release()
         try:
-            if self.active_entry_id:
-                await self.queue.complete_entry(
-                    self.active_entry_id, result, self.current_try
-                )
-                await self.ws.broadcast_turn_end(self.active_entry_id, result)
-
-                # Notify the player directly
-                if self.ctrl:
-                    await self.ctrl.send_to_player(self.active_entry_id, {
-                        "type": "turn_end",
-                        "result": result,
-                        "tries_used": self.current_try,
-                    })
-
-            # Broadcast updated queue status with full entry list
-            status = await self.queue.get_queue_status()
-            entries = await self.queue.list_queue()
-            queue_entries = [
-                {"name": e["name"], "state": e["state"], "position": e["position"]}
-                for e in entries
-            ]
-            await self.ws.broadcast_queue_update(status, queue_entries)
-        except Exception:
-            logger.exception("Error during turn-end cleanup (non-fatal)")
+            await self._notify_turn_end(entry_id, result, tries_used)
+        finally:
+            await self._reacquire_sm_lock()
 
-        # Fire WLED event based on the turn result.
-        # The WLEDClient handles auto-revert to idle after a configurable
-        # delay, so we do NOT fire a separate "idle" event here.
-        wled_event = {"win": "win", "loss": "loss", "expired": "expire"}.get(result)
-        if wled_event:
-            await self._wled_event(wled_event)
+        # _force_recover may have taken over while the lock was released.
+        # Only finish the reset (and schedule the advance) if it did not.
+        if self.state != TurnState.TURN_END:
+            return
 
         # Always reset to IDLE regardless of cleanup errors above
+        self._cancel_turn_end_watchdog()
         self.state = TurnState.IDLE
-        self._last_state_change = time.monotonic()
-        self.active_entry_id = None
-        self.current_try = 0
-        self._state_deadline = 0.0
-        self._turn_deadline = 0.0
+        self._last_state_change = coarse_monotonic()
+        self._cache_state_payload()
 
-        # Schedule advance_queue as a separate task to prevent deadlock.
-        # _end_turn is often called from timer callbacks that fire while
-        # advance_queue() holds _advance_lock.  A direct call here would
-        # deadlock.  The fire-and-forget task will acquire the lock fresh.
+        # Hand advance_queue to the advancer task.  _end_turn is often called
+        # from timer callbacks that fire while an advance is in progress; a
+        # direct call here would run the connection wait under _sm_lock.
         self._schedule_advance()
 
+    async def _notify_turn_end(self, entry_id: str | None, result: str, tries_used: int):
+        """Persist the turn result and tell viewers/the player.  Never raises.
+
+        The DB write must land first so the queue snapshot reflects it; the
+        sends after it are independent and run concurrently.
+        """
+        if entry_id:
+            try:
+                await self.queue.complete_entry(entry_id, result, tries_used)
+            except Exception:
+                logger.exception("Failed to complete entry during turn-end cleanup (non-fatal)")
+
+        sends = []
+        if entry_id:
+            sends.append(self.ws.broadcast_turn_end(entry_id, result))
+            # Notify the player directly
+            if self.ctrl:
+                sends.append(self.ctrl.send_to_player(entry_id, {
+                    "type": "turn_end",
+                    "result": result,
+                    "tries_used": tries_used,
+                }))
+        # Broadcast updated queue status with full entry list
+        sends.append(self._broadcast_queue_snapshot("turn-end cleanup"))
+
+        # Fire WLED event based on the turn result.
+        # The WLEDClient handles auto-revert to idle after a configurable
+        # delay, so we do NOT fire a separate "idle" event here.
+        wled_event = _RESULT_WLED_EVENTS.get(result)
+        if wled_event and self._wled_enabled:
+            sends.append(self._wled_event(wled_event))
+
+        for outcome in await asyncio.gather(*sends, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                logger.error("Error during turn-end cleanup (non-fatal)", exc_info=outcome)
+
+    async def _reacquire_sm_lock(self):
+        """Re-acquire _sm_lock even if cancelled while waiting for it.
+
+        The caller's ``async with self._sm_lock`` will release the lock on
+        exit, so giving up on a cancelled acquire would make that release
+        hit a lock we do not own.  Cancellation is re-raised once held.
+        """
+        cancelled = False
+        while True:
+            try:
+                await self._sm_lock.acquire()
+                break
+            except asyncio.CancelledError:
+                cancelled = True
+        if cancelled:
+            raise asyncio.CancelledError
+
     def _schedule_advance(self):
-        """Schedule advance_queue as a fire-and-forget task.
+        """Wake the advancer loop so it runs advance_queue.
 
-        Safe to call from anywhere — avoids deadlocks on _advance_lock.
+        Safe to call from anywhere, including under _sm_lock.
+        Triggers that arrive before the loop wakes coalesce into a single
+        advance, and a trigger during an in-flight advance causes one more
+        pass afterwards.
         """
-        async def _safe_advance():
+        if self._advancer_task is None or self._advancer_task.done():
+            if self._loop and not self._loop.is_closed():
+                loop = self._loop
+            else:
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    logger.warning("No running event loop for scheduled advance_queue")
+                    return
+            self._advancer_task = loop.create_task(self._advancer_loop())
+        self._advance_event.set()
+
+    async def _advancer_loop(self):
+        while True:
+            await self._advance_event.wait()
+            self._advance_event.clear()
             try:
                 await self.advance_queue()
             except Exception:
                 logger.exception("Scheduled advance_queue failed (periodic check will retry)")
 
-        if self._loop and not self._loop.is_closed():
-            self._loop.create_task(_safe_advance())
-        else:
-            try:
-                loop = asyncio.get_running_loop()
-                loop.create_task(_safe_advance())
-            except RuntimeError:
-                logger.warning("No running event loop for scheduled advance_queue")
+    async def close(self):
+        """Stop background tasks and flush buffered deadlines.  Call on
+        server shutdown, before the database is closed."""
+        for task in (self._advancer_task, self._deadline_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._advancer_task = None
+        self._deadline_task = None
+        self._cancel_turn_end_watchdog()
+        await self._flush_deadlines()
 
     # -- Timers --------------------------------------------------------------
 
-    async def _ready_timeout(self, seconds: int):
-        try:
-            await asyncio.sleep(seconds)
-            async with self._sm_lock:
-                if self.state == TurnState.READY_PROMPT:
-                    logger.info("Ready prompt timed out, skipping player")
-                    self._state_timer = None  # Prevent self-cancellation
-                    await self._end_turn("skipped")
-        except asyncio.CancelledError:
-            pass
-        except Exception:
-            logger.exception("_ready_timeout crashed, forcing recovery")
-            await self._force_recover()
+    def _arm_timer(self, slot: str, seconds: float, expected: tuple, action):
+        """Arm a deadline on ``slot`` (``"_state_timer"`` or ``"_turn_timer"``).
+
+        Uses a plain ``loop.call_later`` handle while waiting; the handler
+        coroutine only becomes a Task once the deadline actually fires.
+        ``action`` runs under _sm_lock only if the state is still one of
+        ``expected`` by then.
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        setattr(self, slot, self._loop.call_later(
+            seconds, self._fire_timer, slot, expected, action,
+        ))
+
+    def _fire_timer(self, slot: str, expected: tuple, action):
+        # Store the Task in the slot so cancelling the timer still cancels
+        # a handler that is waiting on _sm_lock.
+        setattr(self, slot, self._loop.create_task(self._run_timer(slot, expected, action)))
 
-    async def _move_timeout(self, seconds: int):
+    async def _run_timer(self, slot: str, expected: tuple, action):
+        """Shared timer prelude: lock, state guard, crash recovery."""
         try:
-            await asyncio.sleep(seconds)
             async with self._sm_lock:
-                if self.state == TurnState.MOVING:
-                    logger.info("Move timer expired, auto-dropping")
-                    self._state_timer = None  # Prevent self-cancellation
-                    await self._enter_state(TurnState.DROPPING)
+                if self.state in expected:
+                    setattr(self, slot, None)  # Prevent self-cancellation
+                    await action()
         except asyncio.CancelledError:
             pass
         except Exception:
-            logger.exception("_move_timeout crashed, forcing recovery")
+            logger.exception("%s crashed, forcing recovery", action.__name__)
             await self._force_recover()
 
-    async def _drop_hold_timeout(self, seconds: float):
+    async def _ready_timeout(self):
+        logger.info("Ready prompt timed out, skipping player")
+        await self._end_turn("skipped")
+
+    async def _move_timeout(self):
+        logger.info("Move timer expired, auto-dropping")
+        await self._enter_state(TurnState.DROPPING)
+
+    async def _drop_hold_timeout(self):
         """Safety: auto-release drop after max hold time."""
+        logger.info("Drop hold timeout, auto-releasing")
         try:
-            await asyncio.sleep(seconds)
-            async with self._sm_lock:
-                if self.state == TurnState.DROPPING:
-                    logger.info("Drop hold timeout, auto-releasing")
-                    await self.gpio.drop_off()
-                    self._state_timer = None  # Prevent self-cancellation
-                    await self._enter_state(TurnState.POST_DROP)
-        except asyncio.CancelledError:
-            pass
+            await self.gpio.drop_off()
+            await self._enter_state(TurnState.POST_DROP)
         except Exception:
-            logger.exception("_drop_hold_timeout crashed, forcing recovery")
             # Ensure drop relay is off even on error
             try:
                 await self.gpio.drop_off()
             except Exception:
                 pass
-            await self._force_recover()
+            raise
 
-    async def _post_drop_timeout(self, seconds: int):
-        try:
-            await asyncio.sleep(seconds)
-            async with self._sm_lock:
-                if self.state == TurnState.POST_DROP:
-                    self.gpio.unregister_win_callback()
-                    self._state_timer = None  # Prevent self-cancellation
-                    if self.current_try < self.settings.tries_per_player:
-                        if self.settings.win_sensor_enabled:
-                            logger.info("Post-drop timeout, no win — starting next try")
-                        else:
-                            logger.info("Win sensor disabled — advancing to next try")
-                        await self._start_try()
-                    else:
-                        if self.settings.win_sensor_enabled:
-                            logger.info("Post-drop timeout, no win — ending turn as loss")
-                            await self._end_turn("loss")
-                        else:
-                            logger.info("Win sensor disabled — all tries used, ending turn as loss")
-                            await self._end_turn("loss")
-        except asyncio.CancelledError:
-            pass
-        except Exception:
-            logger.exception("_post_drop_timeout crashed, forcing recovery")
-            await self._force_recover()
+    async def _post_drop_timeout(self):
+        self.gpio.unregister_win_callback()
+        if self.current_try < self.settings.tries_per_player:
+            if self.settings.win_sensor_enabled:
+                logger.info("Post-drop timeout, no win — starting next try")
+            else:
+                logger.info("Win sensor disabled — advancing to next try")
+            await self._start_try()
+        else:
+            if self.settings.win_sensor_enabled:
+                logger.info("Post-drop timeout, no win — ending turn as loss")
+            else:
+                logger.info("Win sensor disabled — all tries used, ending turn as loss")
+            await self._end_turn("loss")
 
-    async def _hard_turn_timeout(self, seconds: int):
-        try:
-            await asyncio.sleep(seconds)
-            async with self._sm_lock:
-                if self.state not in (TurnState.IDLE, TurnState.TURN_END):
-                    logger.warning("Hard turn timeout reached")
-                    self._turn_timer = None  # Prevent self-cancellation
-                    await self._end_turn("expired")
-        except asyncio.CancelledError:
-            pass
-        except Exception:
-            logger.exception("_hard_turn_timeout crashed, forcing recovery")
-            await self._force_recover()
+    async def _hard_turn_timeout(self):
+        logger.warning("Hard turn timeout reached")
+        await self._end_turn("expired")
+
+    def _arm_turn_end_watchdog(self):
+        """Arm the TURN_END stuck detector (replacing any previous one).
+
+        TURN_END should resolve in seconds.  If _end_turn is stuck (e.g.
+        GPIO hang), the watchdog forces the state machine back to IDLE
+        exactly turn_end_stuck_timeout_s after the state was entered.
+        """
+        self._cancel_turn_end_watchdog()
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._turn_end_watchdog = self._loop.call_later(
+            self.settings.turn_end_stuck_timeout_s, self._turn_end_stuck,
+        )
+
+    def _cancel_turn_end_watchdog(self):
+        if self._turn_end_watchdog:
+            self._turn_end_watchdog.cancel()
+            self._turn_end_watchdog = None
+
+    def _turn_end_stuck(self):
+        self._turn_end_watchdog = None
+        if self.state != TurnState.TURN_END:
+            return
+        logger.error(
+            "Stuck in TURN_END for %.0fs (entry=%s), forcing recovery",
+            coarse_monotonic() - self._last_state_change, self.active_entry_id,
+        )
+        self._loop.create_task(self._force_recover())
 
     async def _force_recover(self):
         """Emergency recovery: force the state machine back to IDLE.
@@ -606,9 +749,10 @@ class StateMachine:
                     return
 
                 logger.warning("Force recovering state machine to IDLE")
-                if self._state_timer and not self._state_timer.done():
+                self._cancel_turn_end_watchdog()
+                if self._state_timer:
                     self._state_timer.cancel()
-                if self._turn_timer and not self._turn_timer.done():
+                if self._turn_timer:
                     self._turn_timer.cancel()
                 self.gpio.unregister_win_callback()
                 try:
@@ -617,24 +761,29 @@ class StateMachine:
                     logger.exception("GPIO emergency_stop failed during force recovery")
                 # ALWAYS unlock GPIO regardless of what happened above
                 self.gpio._locked = False
-                if self.active_entry_id:
-                    try:
-                        await self.queue.complete_entry(
-                            self.active_entry_id, "error", self.current_try
-                        )
-                    except Exception:
-                        logger.exception("Failed to complete entry during force recovery (non-fatal)")
+                entry_id = self.active_entry_id
+                tries_used = self.current_try
                 self.state = TurnState.IDLE
-                self._last_state_change = time.monotonic()
+                self._last_state_change = coarse_monotonic()
                 self.active_entry_id = None
                 self.current_try = 0
                 self._state_deadline = 0.0
                 self._turn_deadline = 0.0
+            # The DB write runs after _sm_lock is released so handlers and
+            # timers waiting on the lock are not held up by SQLite.  The
+            # state is already IDLE with no active entry, so nothing that
+            # takes the lock meanwhile can act on the old turn.
+            if entry_id:
+                try:
+                    await self.queue.complete_entry(entry_id, "error", tries_used)
+                except Exception:
+                    logger.exception("Failed to complete entry during force recovery (non-fatal)")
         except Exception:
             logger.exception("Force recovery also failed!")
             # Last resort: just reset state so periodic check can pick it up
+            self._cancel_turn_end_watchdog()
             self.state = TurnState.IDLE
-            self._last_state_change = time.monotonic()
+            self._last_state_change = coarse_monotonic()
             self.active_entry_id = None
             self.current_try = 0
             self._state_deadline = 0.0
@@ -644,17 +793,43 @@ class StateMachine:
             self._recovering = False
 
         # Reset WLED to idle after recovery
-        await self._wled_event("idle")
+        if self._wled_enabled:
+            await self._wled_event("idle")
 
         # Schedule advance outside the lock to avoid deadlock
         self._schedule_advance()
 
+    # -- Broadcast helper ----------------------------------------------------
+
+    async def _broadcast_queue_snapshot(self, context: str):
+        """Broadcast the current queue status and entry list.
+
+        The hub handles per-viewer send failures internally, so only the DB
+        reads can fail here; those are logged and the broadcast skipped.
+        """
+        try:
+            status, queue_entries = await asyncio.gather(
+                self.queue.get_queue_status(), self.queue.get_cached_payload(),
+            )
+        except sqlite3.Error as exc:
+            logger.warning("Queue snapshot failed during %s (non-fatal): %s", context, exc)
+            return
+        await self.ws.broadcast_queue_update(status, queue_entries)
+
     # -- WLED helper ---------------------------------------------------------
 
+    @property
+    def _wled_enabled(self) -> bool:
+        # Checked at each call site so a disabled strip costs no coroutine.
+        # Read live: the admin panel can switch WLED on or off at runtime.
+        return self.wled is not None and self.wled.enabled
+
     async def _wled_event(self, event: str):
-        """Fire a WLED event if a client is configured.  Never raises."""
-        if self.wled is None:
-            return
+        """Fire a WLED event.  Never raises.
+
+        Callers check ``_wled_enabled`` first so no coroutine is created
+        when WLED is disabled.
+        """
         try:
             await self.wled.on_event(event)
         except Exception:
@@ -670,51 +845,116 @@ class StateMachine:
 
         asyncio.run_coroutine_threadsafe(self.handle_win(), self._loop)
 
-    def _build_state_payload(self) -> dict:
-        # Compute seconds remaining for the current state timer.
-        # Uses monotonic clock so it's immune to wall-clock adjustments.
-        remaining = 0.0
-        if self._state_deadline > 0:
-            remaining = max(0.0, self._state_deadline - time.monotonic())
-
-        turn_remaining = 0.0
-        if self._turn_deadline > 0:
-            turn_remaining = max(0.0, self._turn_deadline - time.monotonic())
+    @staticmethod
+    def _queued_seconds(entry: dict) -> float:
+        """Seconds since the entry joined the queue (999 if unparseable)."""
+        created = entry.get("created_at") or ""
+        if created.endswith("Z"):
+            # fromisoformat only accepts a "Z" suffix from Python 3.11 on
+            created = created[:-1] + "+00:00"
+        try:
+            dt = datetime.fromisoformat(created)
+        except (TypeError, ValueError):
+            return 999
+        if dt.tzinfo is None:
+            # SQLite stores as ISO without tz — assume UTC
+            dt = dt.replace(tzinfo=timezone.utc)
+        return time.time() - dt.timestamp()
 
+    def _build_state_payload(self) -> dict:
+        state_left, turn_left = self._seconds_left()
         return {
-            "state": self.state.value,
+            "state": self.state.label,
             "active_entry_id": self.active_entry_id,
             "current_try": self.current_try,
             "max_tries": self.settings.tries_per_player,
             "try_move_seconds": self.settings.try_move_seconds,
-            "state_seconds_left": round(remaining, 1),
-            "turn_seconds_left": round(turn_remaining, 1),
+            "state_seconds_left": state_left,
+            "turn_seconds_left": turn_left,
             "win_sensor_enabled": self.settings.win_sensor_enabled,
         }
 
-    async def _write_deadlines(self):
-        """Persist deadline timestamps to DB for SSOT recovery."""
-        if not self.active_entry_id:
+    def _seconds_left(self) -> tuple[float, float]:
+        """Rounded (state, turn) seconds remaining for the payload."""
+        state_deadline = self._state_deadline
+        turn_deadline = self._turn_deadline
+        if state_deadline <= 0 and turn_deadline <= 0:
+            return 0.0, 0.0  # IDLE / between turns: no clock read needed
+        # Uses monotonic clock so it's immune to wall-clock adjustments.
+        now_m = coarse_monotonic()
+        state_left = round(max(0.0, state_deadline - now_m), 1) if state_deadline > 0 else 0.0
+        turn_left = round(max(0.0, turn_deadline - now_m), 1) if turn_deadline > 0 else 0.0
+        return state_left, turn_left
+
+    def _cache_state_payload(self) -> dict:
+        """Rebuild the state payload after a transition and cache it."""
+        payload = self._build_state_payload()
+        self._cached_payload = payload
+        self._cached_payload_key = (self.state, self.active_entry_id, self.current_try)
+        return payload
+
+    def get_current_payload(self) -> dict:
+        """Return the current state payload without rebuilding it.
+
+        The cached payload is reused while the (state, entry, try) it was
+        built for still holds; only the remaining-time fields are recomputed.
+        Falls back to a full rebuild if the state was changed outside
+        _enter_state/_end_turn (e.g. force recovery).
+        """
+        key = (self.state, self.active_entry_id, self.current_try)
+        if self._cached_payload is None or self._cached_payload_key != key:
+            return self._cache_state_payload()
+        payload = dict(self._cached_payload)
+        payload["state_seconds_left"], payload["turn_seconds_left"] = self._seconds_left()
+        return payload
+
+    def _write_deadlines(self):
+        """Queue the current deadline timestamps for SSOT recovery.
+
+        The DB write happens on the deadline flusher task, which coalesces
+        everything buffered since its last pass into one transaction, so a
+        transition never waits on the write lock while holding _sm_lock.
+        """
+        entry_id = self.active_entry_id
+        if not entry_id:
             return
+        # Project each monotonic deadline onto the wall clock with plain
+        # epoch arithmetic; only the final timestamp becomes a datetime.
+        wall = time.time()
+        now_m = coarse_monotonic()
+        move_end = None
+        turn_end = None
+        if self._state_deadline > 0:
+            target = wall + max(0, self._state_deadline - now_m)
+            move_end = datetime.fromtimestamp(target, timezone.utc).isoformat(timespec="milliseconds")
+        if self._turn_deadline > 0:
+            target = wall + max(0, self._turn_deadline - now_m)
+            turn_end = datetime.fromtimestamp(target, timezone.utc).isoformat(timespec="milliseconds")
+        # Latest value per entry wins; older unflushed values are dropped.
+        self._deadline_buf[entry_id] = (move_end, turn_end)
+        if self._deadline_task is None or self._deadline_task.done():
+            self._deadline_task = asyncio.get_running_loop().create_task(self._deadline_flusher())
+        self._deadline_wake.set()
+
+    async def _deadline_flusher(self):
+        while True:
+            await self._deadline_wake.wait()
+            self._deadline_wake.clear()
+            await self._flush_deadlines()
+
+    async def _flush_deadlines(self):
+        """Persist all buffered deadlines in one transaction.  Never raises."""
+        if not self._deadline_buf:
+            return
+        pending, self._deadline_buf = self._deadline_buf, {}
         try:
-            from datetime import datetime, timezone, timedelta
-            from app.database import get_db
-            import app.database as _db_mod
-            now = datetime.now(timezone.utc)
-            move_end = None
-            turn_end = None
-            if self._state_deadline > 0:
-                secs_left = max(0, self._state_deadline - time.monotonic())
-                move_end = (now + timedelta(seconds=secs_left)).isoformat()
-            if self._turn_deadline > 0:
-                secs_left = max(0, self._turn_deadline - time.monotonic())
-                turn_end = (now + timedelta(seconds=secs_left)).isoformat()
             db = await get_db()
             async with _db_mod._write_lock:
-                await db.execute(
+                await db.executemany(
                     "UPDATE queue_entries SET try_move_end_at = ?, turn_end_at = ? WHERE id = ?",
-                    (move_end, turn_end, self.active_entry_id),
+                    [(move_end, turn_end, entry_id) for entry_id, (move_end, turn_end) in pending.items()],
                 )
                 await db.commit()
         except Exception:
             logger.exception("Failed to write deadlines to DB (non-fatal)")
+
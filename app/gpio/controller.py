@@ -6,8 +6,8 @@ without real GPIO hardware.
 
 Executor auto-recovery
 ~~~~~~~~~~~~~~~~~~~~~~
-All hardware calls are funnelled through a single-threaded
-``ThreadPoolExecutor`` to serialise access to the GPIO chip.  If *any*
+All hardware calls are funnelled through a single dedicated worker thread
+(``_GpioExecutor``) to serialise access to the GPIO chip.  If *any*
 lgpio call blocks (bus contention, kernel driver hiccup, hardware latch-up)
 the executor thread is permanently dead and every subsequent GPIO operation
 would hang behind it forever.
@@ -20,21 +20,103 @@ objects continue to work on the replacement executor.
 """
 
 import asyncio
+import functools
 import logging
 import os
+import queue
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable
+from enum import IntEnum
 
+from app.clock import coarse_monotonic
 from app.config import settings
 
 logger = logging.getLogger("gpio")
 
-OPPOSING = {
-    "north": "south",
-    "south": "north",
-    "east": "west",
-    "west": "east",
-}
+
+class Dir(IntEnum):
+    """Joystick directions.  Opposing pairs differ only in the low bit, so
+    ``d ^ 1`` is the opposite of ``d``."""
+
+    NORTH = 0
+    SOUTH = 1
+    EAST = 2
+    WEST = 3
+
+
+# Output name for each Dir, and the API-level name -> Dir lookup used to
+# translate a direction string once at the public entry points.
+DIR_NAMES = tuple(d.name.lower() for d in Dir)
+_DIR_BY_NAME = {name: Dir(i) for i, name in enumerate(DIR_NAMES)}
+
+
+class _GpioExecutor:
+    """Single GPIO worker thread fed by a command queue.
+
+    Each submitted call gets one asyncio future that the worker resolves
+    directly via ``call_soon_threadsafe`` — no ``concurrent.futures.Future``
+    and ``wrap_future`` chaining per operation.  The thread is a daemon so
+    a worker stuck inside an lgpio call cannot block interpreter exit.
+    """
+
+    def __init__(self):
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, loop: asyncio.AbstractEventLoop, func, *args) -> asyncio.Future:
+        """Queue ``func(*args)`` for the worker; must be called on ``loop``."""
+        fut = loop.create_future()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gpio", daemon=True)
+            self._thread.start()
+        self._queue.put((loop, fut, func, args))
+        return fut
+
+    def shutdown(self):
+        """Stop accepting work and cancel everything still queued.
+
+        A call already running on the worker cannot be interrupted; the
+        thread exits once it returns.
+        """
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            loop, fut, func, args = item
+            if fut.done():
+                # The caller timed out (or was cancelled) while queued.
+                continue
+            try:
+                result = func(*args)
+            except BaseException as exc:
+                outcome = (_set_future_exception, fut, exc)
+            else:
+                outcome = (_set_future_result, fut, result)
+            try:
+                loop.call_soon_threadsafe(*outcome)
+            except RuntimeError:
+                pass  # Event loop already closed (shutdown)
+
+
+def _set_future_result(fut: asyncio.Future, result):
+    if not fut.done():
+        fut.set_result(result)
+
+
+def _set_future_exception(fut: asyncio.Future, exc: BaseException):
+    if not fut.done():
+        fut.set_exception(exc)
 
 
 class MockOutputDevice:
@@ -69,17 +151,45 @@ class MockInputDevice:
         logger.debug(f"[MOCK] InputDevice pin {self.pin} closed")
 
 
+@functools.cache
+def _device_classes(mock: bool) -> tuple[type, type]:
+    """Resolve the (output, input) device classes once per mode.
+
+    gpiozero is only imported for real hardware, so development machines
+    without it can still run with mock GPIO.
+    """
+    if mock:
+        return MockOutputDevice, MockInputDevice
+    os.environ.setdefault("GPIOZERO_PIN_FACTORY", "lgpio")
+    from gpiozero import DigitalInputDevice, OutputDevice
+    return OutputDevice, DigitalInputDevice
+
+
 class GPIOController:
     def __init__(self):
         self._outputs: dict[str, object] = {}
-        self._active_holds: dict[str, asyncio.Task] = {}
-        self._last_pulse: dict[str, float] = {}
+        # Bound on/off methods per output, created once in _init_devices so
+        # each GPIO op does not allocate a fresh bound method.
+        self._on_fns: dict[str, Callable[[], None]] = {}
+        self._off_fns: dict[str, Callable[[], None]] = {}
+        # Hold-timeout task per direction, indexed by Dir (None = not held).
+        self._active_holds: list[asyncio.Task | None] = [None] * len(Dir)
+        # Directions whose last OFF is known to have succeeded.  Releasing
+        # one of these again needs no GPIO call; a failed or unknown OFF
+        # keeps the direction out of the set so it is retried.
+        self._confirmed_off: set[Dir] = set(Dir)
+        # Pulse outputs only; pre-seeded so pulse() can index directly.
+        self._last_pulse: dict[str, float] = {"coin": 0.0, "drop": 0.0}
+        self._pulse_locks = {"coin": asyncio.Lock(), "drop": asyncio.Lock()}
         self._locked = False
         self._initialized = False
         self._win_input = None
-        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
-            max_workers=1, thread_name_prefix="gpio"
-        )
+        # Event loop the controller runs on, bound by the first GPIO call
+        # (normally initialize()) so later calls skip get_running_loop().
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._executor = _GpioExecutor()
+        # Set by initialize() when using mock devices (see _output_call).
+        self._inline_outputs = False
         # Circuit breaker: track executor replacements in a rolling window.
         # If replacements exceed the configured maximum within the window,
         # the process exits so the systemd watchdog can restart it cleanly.
@@ -99,12 +209,15 @@ class GPIOController:
         """
         if timeout is None:
             timeout = settings.gpio_op_timeout_s
+        loop = self._loop
+        if loop is None:
+            loop = self._loop = asyncio.get_running_loop()
+        fut = self._executor.submit(loop, func, *args)
+        # A single timer handle that fails the future on expiry — cheaper
+        # than wait_for's wrapper future and callbacks on every GPIO op.
+        expiry = loop.call_later(timeout, _set_future_exception, fut, asyncio.TimeoutError())
         try:
-            loop = asyncio.get_running_loop()
-            await asyncio.wait_for(
-                loop.run_in_executor(self._executor, func, *args),
-                timeout=timeout,
-            )
+            await fut
             return True
         except asyncio.TimeoutError:
             logger.error(
@@ -118,14 +231,34 @@ class GPIOController:
                 "GPIO %s failed", getattr(func, '__name__', str(func)),
             )
             return False
+        finally:
+            expiry.cancel()
+
+    async def _output_call(self, func, *args) -> bool:
+        """Run an output on/off call.
+
+        Mock devices only flip a bool, so in mock mode the call runs inline
+        instead of paying the thread hand-off; real hardware always goes
+        through ``_gpio_call`` and its timeout.
+        """
+        if not self._inline_outputs:
+            return await self._gpio_call(func, *args)
+        try:
+            func(*args)
+            return True
+        except Exception:
+            logger.exception(
+                "GPIO %s failed", getattr(func, '__name__', str(func)),
+            )
+            return False
 
     def _replace_executor(self):
         """Abandon a stuck executor and create a fresh one.
 
         The old thread may still be blocked inside an lgpio call — there is
-        no way to kill it from Python.  ``shutdown(wait=False)`` tells the
-        pool to stop accepting work; the stuck thread will be reaped when
-        the process exits.
+        no way to kill it from Python.  ``shutdown()`` cancels its queued
+        work and tells the thread to exit if the call ever returns; being a
+        daemon, it never holds up process exit.
 
         Circuit breaker: if too many replacements happen within a rolling
         window, the hardware is likely in a bad state (sustained bus noise,
@@ -151,13 +284,8 @@ class GPIOController:
             os._exit(1)
 
         old = self._executor
-        self._executor = ThreadPoolExecutor(
-            max_workers=1, thread_name_prefix="gpio"
-        )
-        try:
-            old.shutdown(wait=False, cancel_futures=True)
-        except Exception:
-            pass
+        self._executor = _GpioExecutor()
+        old.shutdown()
         logger.warning(
             "GPIO executor replaced (%d/%d in window) — old thread may still be blocked",
             self._executor_replacements,
@@ -170,6 +298,7 @@ class GPIOController:
         """Call once at server startup."""
         if not await self._gpio_call(self._init_devices, timeout=settings.gpio_init_timeout_s):
             logger.error("GPIO initialisation failed — hardware may not work")
+        self._inline_outputs = settings.mock_gpio
         self._initialized = True
         logger.info("GPIO controller initialized (mock=%s)", settings.mock_gpio)
 
@@ -184,24 +313,13 @@ class GPIOController:
             "drop": settings.pin_drop,
         }
 
-        if settings.mock_gpio:
-            OutputDevice = MockOutputDevice
-            InputDevice = MockInputDevice
-        else:
-            os.environ.setdefault("GPIOZERO_PIN_FACTORY", "lgpio")
-            from gpiozero import DigitalInputDevice, OutputDevice as RealOutputDevice
-            OutputDevice = RealOutputDevice
-            InputDevice = DigitalInputDevice
-
+        OutputDevice, InputDevice = _device_classes(settings.mock_gpio)
         active_high = not settings.relay_active_low
         for name, pin in pin_map.items():
-            self._outputs[name] = OutputDevice(pin, active_high=active_high, initial_value=False)
-            self._last_pulse[name] = 0.0
-
-        if settings.mock_gpio:
-            self._win_input = MockInputDevice(settings.pin_win, pull_up=False, bounce_time=0.1)
-        else:
-            self._win_input = InputDevice(settings.pin_win, pull_up=False, bounce_time=0.1)
+            dev = self._outputs[name] = OutputDevice(pin, active_high=active_high, initial_value=False)
+            self._on_fns[name] = dev.on
+            self._off_fns[name] = dev.off
+        self._win_input = InputDevice(settings.pin_win, pull_up=False, bounce_time=0.1)
 
     async def cleanup(self):
         """Call on server shutdown. Forces all OFF, closes devices."""
@@ -232,18 +350,32 @@ class GPIOController:
         caller (typically ``_end_turn`` sets ``_locked = False`` directly).
         """
         self._locked = True
-        for task in self._active_holds.values():
-            task.cancel()
-        self._active_holds.clear()
-        if await self._gpio_call(self._all_off):
+        self._cancel_holds()
+        ok = await self._output_call(self._all_off)
+        # A pulse that passed its lock check before _locked was set may
+        # still switch its pin on.  Wait out in-flight pulses (those still
+        # queued on a pin lock re-check _locked and give up), then switch
+        # everything off again so no pin is left on after this returns.
+        busy = [lock for lock in self._pulse_locks.values() if lock.locked()]
+        for lock in busy:
+            async with lock:
+                pass
+        if busy:
+            ok = await self._output_call(self._all_off)
+        if ok:
+            self._confirmed_off.update(Dir)
             logger.warning("EMERGENCY STOP: all outputs OFF")
         else:
             logger.error("EMERGENCY STOP: _all_off failed (GPIO may be in bad state)")
 
     def _all_off(self):
-        for name, dev in self._outputs.items():
+        self._devices_off(self._outputs)
+
+    def _devices_off(self, names):
+        """Turn several outputs off in one worker call."""
+        for name in names:
             try:
-                dev.off()
+                self._outputs[name].off()
             except Exception:
                 # Continue turning off remaining devices even if one fails.
                 logger.exception("Failed to turn off GPIO device %s", name)
@@ -256,52 +388,91 @@ class GPIOController:
 
     async def direction_on(self, direction: str) -> bool:
         """Start holding a direction. Returns False if rejected or on error."""
-        if self._locked or direction not in OPPOSING:
+        d = _DIR_BY_NAME.get(direction)
+        if self._locked or d is None:
             return False
 
-        opposite = OPPOSING[direction]
-        if opposite in self._active_holds:
+        opposite = d ^ 1
+        if self._active_holds[opposite] is not None:
             if settings.direction_conflict_mode == "ignore_new":
                 return False
             else:
-                await self.direction_off(opposite)
+                await self._direction_off(Dir(opposite))
 
-        if direction in self._active_holds:
+        if self._active_holds[d] is not None:
             return True
 
-        if not await self._gpio_call(self._outputs[direction].on):
+        self._confirmed_off.discard(d)
+        if not await self._output_call(self._on_fns[direction]):
             return False
         logger.debug(f"Direction ON: {direction}")
 
-        task = asyncio.create_task(
-            self._hold_timeout(direction, settings.direction_hold_max_ms / 1000.0)
+        task = self._loop.create_task(
+            self._hold_timeout(d, settings.direction_hold_max_ms / 1000.0)
         )
-        self._active_holds[direction] = task
+        self._active_holds[d] = task
         return True
 
     async def direction_off(self, direction: str) -> bool:
         """Release a direction."""
-        if direction in self._active_holds:
-            self._active_holds[direction].cancel()
-            del self._active_holds[direction]
-        if not await self._gpio_call(self._outputs[direction].off):
+        d = _DIR_BY_NAME.get(direction)
+        if d is None:
+            return False
+        return await self._direction_off(d)
+
+    async def _direction_off(self, d: Dir) -> bool:
+        task = self._active_holds[d]
+        if task:
+            self._active_holds[d] = None
+            task.cancel()
+        elif d in self._confirmed_off:
+            return True  # Not held and already off: nothing to send
+        return await self._output_off(d)
+
+    async def _output_off(self, d: Dir) -> bool:
+        name = DIR_NAMES[d]
+        if not await self._output_call(self._off_fns[name]):
             return False
-        logger.debug(f"Direction OFF: {direction}")
+        self._confirmed_off.add(d)
+        logger.debug(f"Direction OFF: {name}")
         return True
 
-    async def _hold_timeout(self, direction: str, timeout: float):
+    async def _hold_timeout(self, d: Dir, timeout: float):
         """Safety: auto-release after max hold time."""
         try:
             await asyncio.sleep(timeout)
-            logger.warning(f"Hold timeout reached for {direction}, forcing OFF")
-            await self.direction_off(direction)
+            logger.warning(f"Hold timeout reached for {DIR_NAMES[d]}, forcing OFF")
+            # Drop our own entry rather than going through _direction_off,
+            # which would cancel this task before the OFF is sent.
+            if self._active_holds[d] is asyncio.current_task():
+                self._active_holds[d] = None
+            await self._output_off(d)
         except asyncio.CancelledError:
             pass
 
+    def _cancel_holds(self) -> list[Dir]:
+        """Cancel every hold timeout and clear the slots; return what was held."""
+        held = []
+        for d, task in enumerate(self._active_holds):
+            if task:
+                task.cancel()
+                self._active_holds[d] = None
+                held.append(Dir(d))
+        return held
+
     async def all_directions_off(self):
-        """Release all directions. Call on turn transitions."""
-        for d in list(self._active_holds.keys()):
-            await self.direction_off(d)
+        """Release all directions. Call on turn transitions.
+
+        All held relays are switched off in a single GPIO submission rather
+        than one round-trip per direction.
+        """
+        held = self._cancel_holds()
+        if not held:
+            return
+        directions = [DIR_NAMES[d] for d in held]
+        if await self._output_call(self._devices_off, directions):
+            self._confirmed_off.update(held)
+            logger.debug("Directions OFF: %s", ", ".join(directions))
 
     # -- Drop Hold -----------------------------------------------------------
 
@@ -309,14 +480,14 @@ class GPIOController:
         """Turn on the drop relay (hold). Returns False if rejected or on error."""
         if self._locked:
             return False
-        if not await self._gpio_call(self._outputs["drop"].on):
+        if not await self._output_call(self._on_fns["drop"]):
             return False
         logger.debug("Drop relay ON (hold)")
         return True
 
     async def drop_off(self) -> bool:
         """Turn off the drop relay."""
-        if not await self._gpio_call(self._outputs["drop"].off):
+        if not await self._output_call(self._off_fns["drop"]):
             return False
         logger.debug("Drop relay OFF")
         return True
@@ -328,8 +499,8 @@ class GPIOController:
         if self._locked or name not in ("coin", "drop"):
             return False
 
-        now = time.monotonic()
-        elapsed_ms = (now - self._last_pulse.get(name, 0)) * 1000
+        now = coarse_monotonic()
+        elapsed_ms = (now - self._last_pulse[name]) * 1000
         if elapsed_ms < settings.min_inter_pulse_ms:
             logger.debug(f"Pulse {name} rejected: cooldown ({elapsed_ms:.0f}ms)")
             return False
@@ -337,18 +508,25 @@ class GPIOController:
         duration_ms = settings.coin_pulse_ms if name == "coin" else settings.drop_pulse_ms
         self._last_pulse[name] = now
 
-        if not await self._gpio_call(self._do_pulse, name, duration_ms,
-                                     timeout=settings.gpio_pulse_timeout_s):
+        # The pulse width is timed on the event loop, not by sleeping in the
+        # GPIO thread, so other GPIO calls are not queued behind it.  The
+        # per-pin lock keeps overlapping pulses on one pin from cutting each
+        # other short.
+        async with self._pulse_locks[name]:
+            if self._locked:
+                return False  # emergency stop ran while we waited
+            if not await self._output_call(self._on_fns[name]):
+                return False
+            try:
+                await asyncio.sleep(duration_ms / 1000.0)
+            finally:
+                # Always release, even if the caller was cancelled mid-pulse.
+                off_ok = await self._output_call(self._off_fns[name])
+        if not off_ok:
             return False
         logger.info(f"Pulse {name}: {duration_ms}ms")
         return True
 
-    def _do_pulse(self, name: str, duration_ms: int):
-        dev = self._outputs[name]
-        dev.on()
-        time.sleep(duration_ms / 1000.0)
-        dev.off()
-
     # -- Win Input -----------------------------------------------------------
 
     def register_win_callback(self, callback):
@@ -364,7 +542,7 @@ class GPIOController:
 
     @property
     def active_directions(self) -> list[str]:
-        return list(self._active_holds.keys())
+        return [DIR_NAMES[d] for d, task in enumerate(self._active_holds) if task]
 
     @property
     def is_locked(self) -> bool:
@@ -4,6 +4,7 @@ import logging
 import os
 import time
 import asyncio
+import heapq
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, WebSocket
@@ -19,10 +20,11 @@ from app.api.stream import router as stream_router
 from app.api.stream_proxy import router as stream_proxy_router, close_proxy_client
 from app.api.hls_proxy import router as hls_proxy_router, close_hls_client
 from app.camera import Camera
+from app.clock import coarse_monotonic
 from app.config import settings
-from app.database import close_db, get_db, prune_old_entries
+from app.database import close_db, get_db, prune_all
 from app.game.queue_manager import QueueManager
-from app.game.state_machine import StateMachine
+from app.game.state_machine import TURN_ACTIVE_STATES, StateMachine, TurnState
 from app.gpio.controller import GPIOController
 from app.wled import WLEDClient
 from app.ws.control_handler import ControlHandler
@@ -35,23 +37,16 @@ logging.basicConfig(
 logger = logging.getLogger("main")
 
 
-async def _periodic_db_prune():
-    """Background task that prunes old DB entries and rate limit records."""
-    while True:
-        await asyncio.sleep(settings.db_prune_interval_s)
-        try:
-            await prune_old_entries(settings.db_retention_hours)
-        except Exception:
-            logger.exception("Periodic DB prune failed")
-        try:
-            from app.api.routes import prune_rate_limits
-            await prune_rate_limits(settings.rate_limit_prune_age_s)
-        except Exception:
-            logger.exception("Periodic rate limit prune failed")
-
-
-async def _periodic_queue_check(sm, interval_seconds: int | None = None):
-    """Safety net: periodically check if the state machine is IDLE with
+async def _db_prune():
+    """Prune old DB entries and rate limit records (one pass)."""
+    try:
+        await prune_all(settings.db_retention_hours, settings.rate_limit_prune_age_s)
+    except Exception:
+        logger.exception("Periodic DB prune failed")
+
+
+async def _queue_check(sm, verified: tuple | None = None) -> tuple | None:
+    """Safety net: check (one pass) if the state machine is IDLE with
     waiting players and kick-start the queue if so.  Also detects stuck
     states where the active entry was cancelled/completed externally,
     and any state that has been stuck for longer than the hard maximum.
@@ -59,13 +54,11 @@ async def _periodic_queue_check(sm, interval_seconds: int | None = None):
     All state mutations go through sm._sm_lock or sm._force_recover()
     (which acquires _sm_lock internally) so we never race with timer
     callbacks or WebSocket handlers.
-    """
-    from app.game.state_machine import TurnState
-    import time as _time
-
-    if interval_seconds is None:
-        interval_seconds = settings.queue_check_interval_s
 
+    Returns a snapshot of the active turn once its DB entry has been seen
+    live; pass it back as ``verified`` on the next call to skip the entry
+    lookup while neither the turn nor the queue has changed since.
+    """
     # Hard maximum time a non-IDLE state can persist before forced recovery.
     # This catches any edge case where timers are silently lost (GC, task
     # cancellation, unhandled exception).  The budget is generous to avoid
@@ -73,48 +66,41 @@ async def _periodic_queue_check(sm, interval_seconds: int | None = None):
     max_non_idle_seconds = (
         settings.turn_time_seconds + settings.ready_prompt_seconds + 60
     )
-    # TURN_END should never last more than a few seconds (GPIO cleanup).
-    max_turn_end_seconds = settings.turn_end_stuck_timeout_s
+    # A stuck TURN_END is caught by the state machine's own one-shot
+    # watchdog (see StateMachine._arm_turn_end_watchdog).
 
-    while True:
-        await asyncio.sleep(interval_seconds)
-        try:
-            if sm.state == TurnState.IDLE and sm.active_entry_id is None:
-                waiting = await sm.queue.get_waiting_count()
-                if waiting > 0:
-                    logger.info("Periodic queue check: IDLE with %d waiting, advancing", waiting)
-                    await sm.advance_queue()
-            elif sm.state == TurnState.IDLE and sm.active_entry_id is not None:
-                # Stuck state: SM is IDLE but active_entry_id wasn't cleared.
-                # This happens if advance_queue() partially executed (set
-                # active_entry_id) but crashed before entering READY_PROMPT.
-                # Use _sm_lock to avoid racing with a timer callback that
-                # might be in the middle of fixing this itself.
-                async with sm._sm_lock:
-                    # Re-check under lock — state may have changed
-                    if sm.state == TurnState.IDLE and sm.active_entry_id is not None:
-                        logger.warning(
-                            "Periodic queue check: IDLE but active_entry_id=%s still set, clearing",
-                            sm.active_entry_id,
-                        )
-                        sm.active_entry_id = None
-                        sm.current_try = 0
+    try:
+        if sm.state == TurnState.IDLE and sm.active_entry_id is None:
+            if not sm.queue.maybe_has_waiters:
+                return None  # no queue writes since the last empty count
+            waiting = await sm.queue.get_waiting_count()
+            if waiting > 0:
+                logger.info("Periodic queue check: IDLE with %d waiting, advancing", waiting)
                 await sm.advance_queue()
-            elif sm.state == TurnState.TURN_END:
-                # TURN_END should resolve in seconds.  If _end_turn is stuck
-                # (e.g. GPIO hang), force the state machine back to IDLE.
-                stuck_seconds = _time.monotonic() - sm._last_state_change
-                if stuck_seconds > max_turn_end_seconds:
-                    logger.error(
-                        "Periodic queue check: stuck in TURN_END for %.0fs "
-                        "(entry=%s), forcing recovery",
-                        stuck_seconds, sm.active_entry_id,
+        elif sm.state == TurnState.IDLE and sm.active_entry_id is not None:
+            # Stuck state: SM is IDLE but active_entry_id wasn't cleared.
+            # This happens if advance_queue() partially executed (set
+            # active_entry_id) but crashed before entering READY_PROMPT.
+            # Use _sm_lock to avoid racing with a timer callback that
+            # might be in the middle of fixing this itself.
+            async with sm._sm_lock:
+                # Re-check under lock — state may have changed
+                if sm.state == TurnState.IDLE and sm.active_entry_id is not None:
+                    logger.warning(
+                        "Periodic queue check: IDLE but active_entry_id=%s still set, clearing",
+                        sm.active_entry_id,
                     )
-                    await sm._force_recover()
-            elif sm.state not in (TurnState.IDLE, TurnState.TURN_END) and sm.active_entry_id:
-                # Check if the active entry has been externally terminated
-                # (e.g. cancelled via leave, or completed by a race condition).
-                # If so, the state machine is stuck — force recovery.
+                    sm.active_entry_id = None
+                    sm.current_try = 0
+            await sm.advance_queue()
+        elif sm.state in TURN_ACTIVE_STATES and sm.active_entry_id:
+            # Check if the active entry has been externally terminated
+            # (e.g. cancelled via leave, or completed by a race condition).
+            # If so, the state machine is stuck — force recovery.  Only a
+            # queue write can terminate it, so the lookup is skipped while
+            # the turn and the queue generation match the last verified one.
+            snapshot = (sm.active_entry_id, sm._last_state_change, sm.queue.generation)
+            if snapshot != verified:
                 entry = await sm.queue.get_by_id(sm.active_entry_id)
                 if entry is None or entry["state"] in ("done", "cancelled"):
                     logger.warning(
@@ -124,21 +110,84 @@ async def _periodic_queue_check(sm, interval_seconds: int | None = None):
                         sm.state,
                     )
                     await sm._force_recover()
-                else:
-                    # General stuck-state detector: if ANY non-IDLE state has
-                    # persisted longer than the hard maximum, all timers have
-                    # failed — force recovery.
-                    stuck_seconds = _time.monotonic() - sm._last_state_change
-                    if stuck_seconds > max_non_idle_seconds:
-                        logger.error(
-                            "Periodic queue check: state %s stuck for %.0fs "
-                            "(entry=%s), exceeds hard max of %ds — forcing recovery",
-                            sm.state, stuck_seconds,
-                            sm.active_entry_id, max_non_idle_seconds,
-                        )
-                        await sm._force_recover()
-        except Exception:
-            logger.exception("Periodic queue check failed")
+                    return None
+                verified = snapshot
+            # General stuck-state detector: if ANY non-IDLE state has
+            # persisted longer than the hard maximum, all timers have
+            # failed — force recovery.
+            stuck_seconds = coarse_monotonic() - sm._last_state_change
+            if stuck_seconds > max_non_idle_seconds:
+                logger.error(
+                    "Periodic queue check: state %s stuck for %.0fs "
+                    "(entry=%s), exceeds hard max of %ds — forcing recovery",
+                    sm.state, stuck_seconds,
+                    sm.active_entry_id, max_non_idle_seconds,
+                )
+                await sm._force_recover()
+                return None
+            return verified
+    except Exception:
+        logger.exception("Periodic queue check failed")
+    return None
+
+
+async def _queue_watch(sm):
+    """Drive _queue_check(): every queue_check_interval_s while there is
+    anything to watch, edge-triggered while idle.
+
+    When the state machine is IDLE with no active entry and the queue is
+    known empty, nothing can go wrong until the queue is written to, so
+    the watcher waits for the next queue write (with a long
+    queue_idle_check_interval_s timeout as a last resort) instead of
+    waking every few seconds.  A queue write resumes regular polling
+    rather than checking at once, since the write path already advances
+    the queue itself.
+    """
+    queue = sm.queue
+    verified = None
+    while True:
+        if (sm.state == TurnState.IDLE and sm.active_entry_id is None
+                and not queue.maybe_has_waiters):
+            if await queue.wait_for_write(settings.queue_idle_check_interval_s):
+                continue
+        else:
+            await asyncio.sleep(settings.queue_check_interval_s)
+        verified = await _queue_check(sm, verified)
+
+
+async def _background_scheduler(hub):
+    """Run the periodic maintenance jobs from a single task.
+
+    Keeps a small heap of ``(next_run, seq, fn, interval_fn)`` entries and
+    sleeps once until the earliest is due, so the event loop carries one
+    timer handle for all of them instead of one per job.  ``seq`` breaks
+    ties between jobs due at the same instant.  Intervals are read through
+    ``interval_fn`` on every reschedule because the admin panel applies
+    them to the live settings object without a restart.
+
+    The status keepalive sweep runs every half interval and pings viewers
+    idle for at least that long, so no viewer goes a full
+    ``status_keepalive_interval_s`` without a frame.
+    """
+    def prune_interval():
+        return settings.db_prune_interval_s
+
+    def keepalive_interval():
+        return settings.status_keepalive_interval_s / 2
+
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    heap = [
+        (now + prune_interval(), 0, _db_prune, prune_interval),
+        (now + keepalive_interval(), 1,
+         lambda: hub.ping_idle(keepalive_interval()), keepalive_interval),
+    ]
+    heapq.heapify(heap)
+    while True:
+        deadline, seq, fn, interval_fn = heap[0]
+        await asyncio.sleep(max(0.0, deadline - loop.time()))
+        heapq.heapreplace(heap, (loop.time() + interval_fn(), seq, fn, interval_fn))
+        await fn()
 
 
 @asynccontextmanager
@@ -150,18 +199,16 @@ async def lifespan(app: FastAPI):
     # - StateMachine and rate limiters use in-memory state
     # - asyncio.Lock in database.py only serialises within one process
     # Multi-worker deployment would cause data corruption and GPIO conflicts.
-    web_concurrency = os.environ.get("WEB_CONCURRENCY", "1")
-    try:
-        if int(web_concurrency) > 1:
-            logger.critical(
-                "FATAL: WEB_CONCURRENCY=%s — Remote Claw requires single-worker mode. "
-                "Multi-worker deployment will cause data corruption and GPIO "
-                "conflicts. Remove WEB_CONCURRENCY or set it to 1.",
-                web_concurrency,
-            )
-            raise SystemExit(1)
-    except ValueError:
-        pass  # Non-integer value, ignore
+    web_concurrency = os.environ.get("WEB_CONCURRENCY", "1").strip()
+    # Non-integer values (e.g. "auto") are ignored.
+    if web_concurrency.isdecimal() and int(web_concurrency) > 1:
+        logger.critical(
+            "FATAL: WEB_CONCURRENCY=%s — Remote Claw requires single-worker mode. "
+            "Multi-worker deployment will cause data corruption and GPIO "
+            "conflicts. Remove WEB_CONCURRENCY or set it to 1.",
+            web_concurrency,
+        )
+        raise SystemExit(1)
 
     from app.config import _resolve_env_file
     env_path = _resolve_env_file()
@@ -217,15 +264,15 @@ async def lifespan(app: FastAPI):
     app.state.state_machine = sm
     app.state.control_handler = ctrl
 
-    # Start periodic DB cleanup task
-    prune_task = asyncio.create_task(_periodic_db_prune())
-    app.state.background_tasks.add(prune_task)
-    prune_task.add_done_callback(app.state.background_tasks.discard)
+    # Start periodic DB cleanup and viewer keepalive
+    scheduler_task = asyncio.create_task(_background_scheduler(ws_hub))
+    app.state.background_tasks.add(scheduler_task)
+    scheduler_task.add_done_callback(app.state.background_tasks.discard)
 
-    # Start periodic queue advancement safety net
-    queue_check_task = asyncio.create_task(_periodic_queue_check(sm))
-    app.state.background_tasks.add(queue_check_task)
-    queue_check_task.add_done_callback(app.state.background_tasks.discard)
+    # Start queue advancement safety net
+    queue_watch_task = asyncio.create_task(_queue_watch(sm))
+    app.state.background_tasks.add(queue_watch_task)
+    queue_watch_task.add_done_callback(app.state.background_tasks.discard)
 
     # Resume queue if entries exist
     await sm.advance_queue()
@@ -241,6 +288,7 @@ async def lifespan(app: FastAPI):
     if tasks:
         await asyncio.gather(*tasks, return_exceptions=True)
 
+    await sm.close()
     if app.state.camera:
         app.state.camera.stop()
     await wled.close()
@@ -338,39 +386,19 @@ async def ws_status(ws: WebSocket):
     if not connected:
         return
 
-    async def _keepalive():
-        """Send periodic pings so intermediate proxies and firewalls
-        don't kill idle viewer connections (important for internet users
-        behind corporate NATs or CDN edge nodes)."""
-        try:
-            while True:
-                await asyncio.sleep(settings.status_keepalive_interval_s)
-                try:
-                    await asyncio.wait_for(
-                        ws.send_text('{"type":"ping"}'),
-                        timeout=settings.status_send_timeout_s,
-                    )
-                except (asyncio.TimeoutError, Exception):
-                    logger.warning("Status WS keepalive: ping send failed, closing")
-                    try:
-                        await ws.close(1001, "Keepalive send failed")
-                    except Exception:
-                        pass
-                    break
-        except asyncio.CancelledError:
-            pass
-
-    ping_task = asyncio.create_task(_keepalive())
     try:
+        # Viewers never send anything meaningful; take the raw ASGI event
+        # so stray frames are dropped without being decoded.
         while True:
-            await ws.receive_text()  # Keep alive; ignore messages
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+        hub.disconnect(ws)
     except WebSocketDisconnect:
         hub.disconnect(ws)
     except Exception as e:
         logger.warning("Status WS error: %s", e)
         hub.disconnect(ws)
-    finally:
-        ping_task.cancel()
 
 
 @app.websocket("/ws/control")
@@ -379,6 +407,8 @@ async def ws_control(ws: WebSocket):
 
 
 # Static files (served by nginx in prod, useful in dev)
-static_dir = os.path.join(os.path.dirname(__file__), "..", "web")
+# Resolved once so per-request path joins start from a canonical directory.
+static_dir = os.path.realpath(os.path.join(os.path.dirname(__file__), "..", "web"))
 if os.path.isdir(static_dir):
-    app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
+    # Existence was just checked; skip StaticFiles' own check.
+    app.mount("/", StaticFiles(directory=static_dir, html=True, check_dir=False), name="static")
@@ -11,46 +11,123 @@ start_turn) stay until the next event.
 
 Requests are serialized through a single sender worker so WLED updates are
 applied in order. This avoids races between overlapping game events.
+Consecutive non-preset requests (``on``, ``bri``) are merged into one POST. A
+fire-and-forget request still waiting to be sent is dropped when a newer
+request for the same field (``ps``, ``on``, ``bri``) is queued, so event
+bursts cost one POST per field rather than one per event.  A preset identical
+to the one sent within ``wled_dedup_window_ms`` is not sent again.
 
 WLED JSON API reference: https://kno.wled.ge/interfaces/json-api/
 """
 
 import asyncio
+import functools
 import logging
+import time
+from collections import deque
 from typing import Any
 
 import httpx
+import orjson
 
 from app.config import settings
 
 logger = logging.getLogger("wled")
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Pre-encoded bodies for every single-field payload the client sends:
+# presets 1-250, on/off and brightness 0-255.
+_BODIES: dict[tuple[str, Any], bytes] = {
+    **{("ps", i): b'{"ps":%d}' % i for i in range(1, 251)},
+    ("on", True): b'{"on":true}',
+    ("on", False): b'{"on":false}',
+    **{("bri", i): b'{"bri":%d}' % i for i in range(256)},
+}
+
+
+def _encode(payload: dict[str, Any]) -> bytes:
+    if len(payload) == 1:
+        body = _BODIES.get(next(iter(payload.items())))
+        if body is not None:
+            return body
+    return orjson.dumps(payload)
+
+
 # Events that are "temporary" — shown for a configurable duration, then
 # the strip auto-reverts to the idle preset.
 _TRANSIENT_EVENTS = frozenset({"win", "loss", "drop", "expire", "grab"})
 
+# Settings attribute holding each event's preset.  Copied into the client by
+# refresh_settings(), which the admin panel calls after editing them.
+_EVENT_PRESET_ATTRS = {
+    "win": "wled_preset_win",
+    "loss": "wled_preset_loss",
+    "drop": "wled_preset_drop",
+    "start_turn": "wled_preset_start_turn",
+    "idle": "wled_preset_idle",
+    "expire": "wled_preset_expire",
+    "grab": "wled_preset_grab",
+}
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=settings.wled_connect_timeout_s,
+        read=settings.wled_read_timeout_s,
+        write=settings.wled_write_timeout_s,
+        pool=settings.wled_pool_timeout_s,
+    )
+
+
+class _Pending:
+    """A queued request.  ``superseded`` marks a fire-and-forget request
+    replaced by a newer one for the same field before it was sent."""
+
+    __slots__ = ("payload", "fut", "superseded")
+
+    def __init__(self, payload: dict[str, Any], fut: asyncio.Future[bool] | None):
+        self.payload = payload
+        self.fut = fut
+        self.superseded = False
+
 
 class WLEDClient:
     """Async client for controlling a WLED device over its JSON API."""
 
     def __init__(self):
         self._client: httpx.AsyncClient | None = None
-        self._revert_task: asyncio.Task | None = None
+        # Pending revert-to-idle timer.  _revert_gen is bumped on every
+        # event so a transient preset confirmed after a newer event arrived
+        # does not arm a stale revert.
+        self._revert_handle: asyncio.TimerHandle | None = None
+        self._revert_gen = 0
         self._sender_task: asyncio.Task | None = None
-        self._queue: asyncio.Queue[tuple[dict[str, Any], asyncio.Future[bool] | None] | None] = asyncio.Queue()
+        # Send queue drained by the sender worker (None stops it), plus the
+        # latest unsent fire-and-forget request per payload field.
+        self._queue: deque[_Pending | None] = deque()
+        self._queue_wake = asyncio.Event()
+        self._latest: dict[str, _Pending] = {}
+        # Last preset posted successfully and when, for the duplicate window.
+        self._last_preset = 0
+        self._last_preset_at = 0.0
+        # DEBUG enabled for this logger?  Refreshed in start().
+        self._debug = False
+        self.refresh_settings()
 
     # -- Lifecycle -----------------------------------------------------------
 
     async def start(self):
         """Create the shared HTTP client and sender worker."""
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+        self.refresh_settings()
         if self._client is None:
-            timeout = httpx.Timeout(
-                connect=settings.wled_connect_timeout_s,
-                read=settings.wled_read_timeout_s,
-                write=settings.wled_write_timeout_s,
-                pool=settings.wled_pool_timeout_s,
-            )
-            self._client = httpx.AsyncClient(timeout=timeout)
+            # The sender worker posts one request at a time; the second
+            # slot is for admin diagnostics (test_connection) running
+            # alongside it.  Both stay open between requests.  The device
+            # is on the LAN, so proxy environment variables are ignored.
+            limits = httpx.Limits(max_connections=2, max_keepalive_connections=2)
+            self._client = httpx.AsyncClient(timeout=_timeout(), limits=limits, trust_env=False)
         if self._sender_task is None or self._sender_task.done():
             self._sender_task = asyncio.create_task(self._sender_loop())
 
@@ -65,10 +142,8 @@ class WLEDClient:
         if self._sender_task is None:
             return
         if not self._sender_task.done():
-            try:
-                self._queue.put_nowait(None)
-            except Exception:
-                pass
+            self._queue.append(None)
+            self._queue_wake.set()
             try:
                 await asyncio.wait_for(self._sender_task, timeout=1.0)
             except Exception:
@@ -77,64 +152,158 @@ class WLEDClient:
 
     # -- Helpers -------------------------------------------------------------
 
-    @property
-    def _enabled(self) -> bool:
-        return bool(settings.wled_enabled and settings.wled_device_ip)
-
-    @property
-    def _base_url(self) -> str:
-        ip = settings.wled_device_ip.strip()
-        if not ip.startswith("http"):
-            ip = f"http://{ip}"
-        return ip.rstrip("/")
+    def refresh_settings(self):
+        """Re-read the ``wled_*`` settings.
+
+        Events and posts work from this snapshot instead of reading
+        ``settings`` each time, so the admin config endpoint calls this
+        after changing any WLED key.
+        """
+        raw = settings.wled_device_ip
+        # Public: the state machine checks it before firing any event.
+        self.enabled = bool(settings.wled_enabled and raw)
+        ip = raw.strip()
+        # Request URLs are pre-parsed once; None without an IP.
+        self._state_url: httpx.URL | None = None
+        self._info_url: httpx.URL | None = None
+        if ip:
+            if not ip.startswith("http"):
+                ip = f"http://{ip}"
+            base = ip.rstrip("/")
+            self._state_url = httpx.URL(f"{base}/json/state")
+            self._info_url = httpx.URL(f"{base}/json/info")
+
+        # Per-event preset, with the shared result fallback already applied
+        fallback = settings.wled_preset_result
+        presets: dict[str, int] = {}
+        for event, attr in _EVENT_PRESET_ATTRS.items():
+            preset = getattr(settings, attr)
+            if preset <= 0 and event in _TRANSIENT_EVENTS:
+                preset = fallback
+            presets[event] = preset
+        self._presets = presets
+
+        self._retries = max(0, settings.wled_http_retries)
+        self._backoff = max(0.0, settings.wled_retry_backoff_seconds)
+        self._result_display_s = max(0.0, settings.wled_result_display_seconds)
+        self._dedup_window_s = max(0, settings.wled_dedup_window_ms) / 1000
+        if self._client is not None:
+            self._client.timeout = _timeout()
 
     def _cancel_revert(self):
-        if self._revert_task and not self._revert_task.done():
-            self._revert_task.cancel()
-        self._revert_task = None
+        self._revert_gen += 1
+        if self._revert_handle is not None:
+            self._revert_handle.cancel()
+            self._revert_handle = None
 
     async def _sender_loop(self):
+        queue = self._queue
         while True:
-            item = await self._queue.get()
+            while not queue:
+                self._queue_wake.clear()
+                await self._queue_wake.wait()
+            item = queue.popleft()
             if item is None:
                 break
-            payload, fut = item
+            if item.superseded:
+                continue
+            self._take(item)
+            batch = [item]
+            payload = item.payload
+            if "ps" not in payload:
+                # Fold the following non-preset requests into one POST.
+                # Presets always go alone: loading one can override on/bri,
+                # so merging across it could change the outcome.
+                await asyncio.sleep(0)  # let a burst finish queueing
+                while queue and queue[0] is not None:
+                    nxt = queue[0]
+                    if not nxt.superseded and "ps" in nxt.payload:
+                        break
+                    queue.popleft()
+                    if nxt.superseded:
+                        continue
+                    self._take(nxt)
+                    if len(batch) == 1:
+                        payload = dict(payload)
+                    payload.update(nxt.payload)
+                    batch.append(nxt)
             ok = await self._post_json(payload)
-            if fut is not None and not fut.done():
-                fut.set_result(ok)
-
-    async def _queue_post(self, payload: dict[str, Any], wait: bool = False) -> bool:
-        if not self._enabled:
+            for sent in batch:
+                if sent.fut is not None and not sent.fut.done():
+                    sent.fut.set_result(ok)
+
+    def _take(self, item: _Pending):
+        """Forget ``item`` as the latest pending request for its fields."""
+        for key in item.payload:
+            if self._latest.get(key) is item:
+                del self._latest[key]
+
+    def _enqueue(self, payload: dict[str, Any], fut: asyncio.Future[bool] | None):
+        # Any newer request for a field supersedes an unsent fire-and-forget
+        # one.  The newer request still goes to the back of the queue, so the
+        # final device state matches strict FIFO delivery.
+        for key in payload:
+            old = self._latest.pop(key, None)
+            if old is not None:
+                old.superseded = True
+        item = _Pending(payload, fut)
+        if fut is None and len(payload) == 1:
+            self._latest[next(iter(payload))] = item
+        self._queue.append(item)
+        self._queue_wake.set()
+
+    def _sender_ready(self) -> bool:
+        if not self.enabled:
             return False
         if self._sender_task is None or self._sender_task.done():
             logger.warning("WLED sender not running, skipping request")
             return False
+        return True
+
+    async def _queue_post(self, payload: dict[str, Any], wait: bool = False) -> bool:
+        if not self._sender_ready():
+            return False
 
         if not wait:
-            self._queue.put_nowait((payload, None))
+            self._enqueue(payload, None)
             return True
 
         loop = asyncio.get_running_loop()
         fut: asyncio.Future[bool] = loop.create_future()
-        self._queue.put_nowait((payload, fut))
+        self._enqueue(payload, fut)
         return await fut
 
     async def _post_json(self, payload: dict[str, Any]) -> bool:
-        if not self._enabled:
+        if not self.enabled:
             return False
         if self._client is None:
             logger.warning("WLED client not started, skipping request")
             return False
 
-        url = f"{self._base_url}/json/state"
-        retries = max(0, settings.wled_http_retries)
-        backoff = max(0.0, settings.wled_retry_backoff_seconds)
+        # Re-sending the preset that was just loaded only restarts its
+        # effect, so a repeat within the window counts as sent.
+        preset = payload.get("ps", 0) if len(payload) == 1 else 0
+        now = time.monotonic()
+        if preset and preset == self._last_preset and now - self._last_preset_at < self._dedup_window_s:
+            if self._debug:
+                logger.debug("WLED: preset %d sent %.0fms ago, skipping", preset, (now - self._last_preset_at) * 1000)
+            return True
+        self._last_preset = 0
+
+        url = self._state_url
+        body = _encode(payload)
+        retries = self._retries
+        backoff = self._backoff
 
         for attempt in range(retries + 1):
             try:
-                resp = await self._client.post(url, json=payload)
+                resp = await self._client.post(url, content=body, headers=_JSON_HEADERS)
                 resp.raise_for_status()
-                logger.debug("WLED request OK: %s", payload)
+                if self._debug:
+                    logger.debug("WLED request OK: %s", payload)
+                if preset:
+                    self._last_preset = preset
+                    self._last_preset_at = time.monotonic()
                 return True
             except httpx.TimeoutException:
                 logger.warning("WLED request timed out (%s), attempt %d/%d", url, attempt + 1, retries + 1)
@@ -152,18 +321,21 @@ class WLEDClient:
     # -- Public API used by the state machine --------------------------------
 
     async def on_event(self, event: str):
-        if not self._enabled:
+        if not self.enabled:
             return
 
-        self._cancel_revert()
         preset = self._preset_for_event(event)
         if preset <= 0:
-            logger.debug("WLED: no preset configured for event '%s', skipping", event)
+            # Leave any pending revert alone: nothing replaces the current
+            # preset, so cancelling it would strand a transient look.
+            if self._debug:
+                logger.debug("WLED: no preset configured for event '%s', skipping", event)
             return
+        self._cancel_revert()
 
         if event in _TRANSIENT_EVENTS:
             idle_preset = self._preset_for_event("idle")
-            delay = max(0.0, settings.wled_result_display_seconds)
+            delay = self._result_display_s
             logger.info(
                 "WLED: triggering preset %d for event '%s' (revert to %s in %.1fs)",
                 preset,
@@ -171,57 +343,52 @@ class WLEDClient:
                 idle_preset if idle_preset > 0 else "none",
                 delay,
             )
-            self._revert_task = asyncio.create_task(
-                self._preset_then_revert(preset, idle_preset, delay, event)
-            )
+            if not self._sender_ready():
+                return
+            # No task per event: the preset's completion arms a plain
+            # call_later revert, which the next event simply cancels.
+            fut: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+            fut.add_done_callback(functools.partial(
+                self._on_transient_sent, self._revert_gen, preset, idle_preset, delay, event,
+            ))
+            self._enqueue({"ps": preset}, fut)
             return
 
         logger.info("WLED: triggering preset %d for event '%s'", preset, event)
         await self._queue_post({"ps": preset}, wait=False)
 
-    async def _preset_then_revert(self, preset_id: int, idle_preset: int, delay: float, event: str):
-        try:
-            ok = await self._queue_post({"ps": preset_id}, wait=True)
-            if not ok:
-                logger.warning("WLED: failed to send preset %d for '%s', skipping revert", preset_id, event)
-                return
-            if idle_preset <= 0 or delay <= 0:
-                return
-            await asyncio.sleep(delay)
-            logger.info("WLED: reverting to idle preset %d after '%s'", idle_preset, event)
-            await self._queue_post({"ps": idle_preset}, wait=False)
-        except asyncio.CancelledError:
-            pass
-        except Exception:
-            logger.exception("WLED preset-then-revert failed for event '%s'", event)
+    def _on_transient_sent(self, gen: int, preset_id: int, idle_preset: int,
+                           delay: float, event: str, fut: asyncio.Future[bool]):
+        if gen != self._revert_gen:
+            return  # A newer event already took over the strip
+        if not fut.result():
+            logger.warning("WLED: failed to send preset %d for '%s', skipping revert", preset_id, event)
+            return
+        if idle_preset <= 0 or delay <= 0:
+            return
+        self._revert_handle = asyncio.get_running_loop().call_later(
+            delay, self._revert_to_idle, idle_preset, event,
+        )
 
-    def _preset_for_event(self, event: str) -> int:
-        event_specific = {
-            "win": settings.wled_preset_win,
-            "loss": settings.wled_preset_loss,
-            "drop": settings.wled_preset_drop,
-            "start_turn": settings.wled_preset_start_turn,
-            "idle": settings.wled_preset_idle,
-            "expire": settings.wled_preset_expire,
-            "grab": settings.wled_preset_grab,
-        }
-        preset = event_specific.get(event, 0)
-        if preset > 0:
-            return preset
+    def _revert_to_idle(self, idle_preset: int, event: str):
+        self._revert_handle = None
+        if not self._sender_ready():
+            return
+        logger.info("WLED: reverting to idle preset %d after '%s'", idle_preset, event)
+        self._enqueue({"ps": idle_preset}, None)
 
-        if event in _TRANSIENT_EVENTS:
-            return settings.wled_preset_result
-        return 0
+    def _preset_for_event(self, event: str) -> int:
+        return self._presets.get(event, 0)
 
     # -- Admin / diagnostic helpers ------------------------------------------
 
     async def test_connection(self) -> dict[str, Any]:
-        if not settings.wled_device_ip:
+        if self._info_url is None:
             return {"ok": False, "error": "No WLED device IP configured"}
         if self._client is None:
             return {"ok": False, "error": "WLED client not started"}
 
-        url = f"{self._base_url}/json/info"
+        url = self._info_url
         try:
             resp = await self._client.get(url)
             resp.raise_for_status()
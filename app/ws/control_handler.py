@@ -1,17 +1,59 @@
 """WebSocket Control Handler — authenticated bidirectional channel for players."""
 
 import asyncio
-import json
 import logging
 import time
 
+import orjson
 from fastapi import WebSocket
 
 from app.database import hash_token
+from app.game.state_machine import TurnState
 
 logger = logging.getLogger("ws.control")
 
-VALID_DIRECTIONS = {"north", "south", "east", "west"}
+VALID_DIRECTIONS = frozenset({"north", "south", "east", "west"})
+
+
+def _dumps(obj) -> str:
+    # Frames stay text since the player page JSON.parses each one.
+    return orjson.dumps(obj).decode()
+
+
+# keydown token bucket size: quick taps up to this many pass at once, while
+# the sustained rate stays capped at command_rate_limit_hz.
+_KEYDOWN_BURST = 4.0
+
+# Latency probe exactly as the player page sends it, and the reply.  The
+# probe is the most frequent control frame, so it is matched before parsing.
+_LATENCY_PING = '{"type":"latency_ping"}'
+_LATENCY_PONG = _dumps({"type": "latency_pong"})
+
+# Other fixed frames, encoded once.
+_KEEPALIVE_PING = _dumps({"type": "ping"})
+_AUTH_REQUIRED = _dumps({"type": "error", "message": "Auth required"})
+_INVALID_TOKEN = _dumps({"type": "error", "message": "Invalid token"})
+
+# control_ack frames per direction, indexed by the GPIO result.  A keydown's
+# key is validated and its reply found with one lookup.
+_CONTROL_ACKS = {
+    key: tuple(_dumps({"type": "control_ack", "key": key, "active": ok}) for ok in (False, True))
+    for key in VALID_DIRECTIONS
+}
+
+
+class _PlayerConn:
+    """Per-connection state for an authenticated player socket."""
+
+    __slots__ = ("ws", "last_activity", "tokens", "tokens_at")
+
+    def __init__(self, ws: WebSocket):
+        now = time.monotonic()
+        self.ws = ws
+        self.last_activity = now  # monotonic time of the last inbound message
+        # keydown token bucket: tokens left as of tokens_at
+        self.tokens = _KEYDOWN_BURST
+        self.tokens_at = now
 
 
 class ControlHandler:
@@ -20,24 +62,25 @@ class ControlHandler:
         self.queue = queue_manager
         self.gpio = gpio_controller
         self.settings = settings
-        self._player_ws: dict[str, WebSocket] = {}  # entry_id -> ws
-        self._last_command_time: dict[str, float] = {}  # entry_id -> monotonic
+        self._players: dict[str, _PlayerConn] = {}  # entry_id -> connection
         self._grace_tasks: dict[str, asyncio.Task] = {}  # entry_id -> grace period task
-        self._last_activity: dict[str, float] = {}  # entry_id -> monotonic (any msg)
-        self._conn_sem = asyncio.Semaphore(settings.max_control_connections)
+        self._connections = 0  # authenticated sockets holding a slot
+        self._connect_waiters: dict[str, asyncio.Event] = {}  # entry_id -> set on connect
+        self._connect_waiter_counts: dict[str, int] = {}  # entry_id -> callers on that event
 
     async def handle_connection(self, ws: WebSocket):
         """Handle a full control WebSocket lifecycle.
 
-        Security: the semaphore is acquired AFTER authentication to prevent
+        Security: a connection slot is taken AFTER authentication to prevent
         slowloris attacks where an attacker opens many connections and holds
-        semaphore slots for the full auth timeout without ever authenticating.
+        slots for the full auth timeout without ever authenticating.
         The pre-auth timeout is intentionally short (2s default) — the real
         frontend sends the token immediately on connection.
         """
         await ws.accept()
         entry_id = None
-        sem_acquired = False
+        conn = None
+        slot_taken = False
         try:
             # Phase 1: Authenticate BEFORE acquiring the semaphore.
             # Uses a short pre-auth timeout to limit unauthenticated
@@ -51,26 +94,27 @@ class ControlHandler:
                 await ws.close(1008, "Auth timeout")
                 return
 
-            msg = json.loads(raw)
+            msg = orjson.loads(raw)
             if msg.get("type") != "auth" or "token" not in msg:
-                await ws.send_text(json.dumps({"type": "error", "message": "Auth required"}))
+                await ws.send_text(_AUTH_REQUIRED)
                 await ws.close(1008)
                 return
 
             token_hash = hash_token(msg["token"])
             entry = await self.queue.get_by_token(token_hash)
             if not entry:
-                await ws.send_text(json.dumps({"type": "error", "message": "Invalid token"}))
+                await ws.send_text(_INVALID_TOKEN)
                 await ws.close(1008)
                 return
 
-            # Phase 2: Authenticated — now acquire the connection semaphore.
-            if self._conn_sem.locked():
+            # Phase 2: Authenticated — now take a connection slot.  Full
+            # means reject, never wait, so a plain counter is enough.
+            if self._connections >= self.settings.max_control_connections:
                 await ws.close(1013, "Too many connections")
                 return
 
-            await self._conn_sem.acquire()
-            sem_acquired = True
+            self._connections += 1
+            slot_taken = True
 
             entry_id = entry["id"]
 
@@ -81,14 +125,16 @@ class ControlHandler:
                 logger.info(f"Player {entry_id} reconnected, cancelled grace period")
 
             # Handle duplicate tabs: close previous connection
-            if entry_id in self._player_ws:
+            old = self._players.get(entry_id)
+            if old is not None:
                 try:
-                    await self._player_ws[entry_id].close(1000, "Replaced by new connection")
+                    await old.ws.close(1000, "Replaced by new connection")
                 except Exception:
                     pass
-            self._player_ws[entry_id] = ws
+            conn = self._players[entry_id] = _PlayerConn(ws)
+            self._wake_connect_waiters(entry_id)
 
-            await ws.send_text(json.dumps({
+            await ws.send_text(_dumps({
                 "type": "auth_ok",
                 "state": entry["state"],
                 "position": entry["position"],
@@ -98,8 +144,8 @@ class ControlHandler:
             # so they can resume after a page refresh (correct try counter,
             # timer, etc.).
             if entry_id == self.sm.active_entry_id:
-                payload = self.sm._build_state_payload()
-                await ws.send_text(json.dumps({
+                payload = self.sm.get_current_payload()
+                await ws.send_text(_dumps({
                     "type": "state_update", **payload
                 }))
 
@@ -109,31 +155,29 @@ class ControlHandler:
             # Records last activity time and proactively closes the
             # socket when no pong (or any message) is received within
             # the liveness threshold.
-            self._last_activity[entry_id] = time.monotonic()
+            conn.last_activity = time.monotonic()
             ping_task = asyncio.create_task(
-                self._keepalive_ping(entry_id, ws)
+                self._keepalive_ping(entry_id, conn)
             )
 
             # Main message loop
             try:
                 async for raw_msg in ws.iter_text():
-                    self._last_activity[entry_id] = time.monotonic()
-                    await self._handle_message(entry_id, raw_msg, ws)
+                    conn.last_activity = time.monotonic()
+                    await self._handle_message(entry_id, raw_msg, conn)
             finally:
                 ping_task.cancel()
 
         except Exception as e:
             logger.error(f"Control WS error for {entry_id}: {e}")
         finally:
-            if sem_acquired:
-                self._conn_sem.release()
-            if entry_id:
+            if slot_taken:
+                self._connections -= 1
+            if conn is not None:
                 # Only clean up if this WS is still the registered one
                 # (a new connection may have already replaced us)
-                if self._player_ws.get(entry_id) is ws:
-                    self._player_ws.pop(entry_id, None)
-                    self._last_command_time.pop(entry_id, None)
-                    self._last_activity.pop(entry_id, None)
+                if self._players.get(entry_id) is conn:
+                    del self._players[entry_id]
                     if entry_id == self.sm.active_entry_id:
                         await self.sm.handle_disconnect(entry_id)
                         # Only start the long grace period for truly active
@@ -142,37 +186,42 @@ class ControlHandler:
                         # (15s) — giving them a 300s grace period would stall
                         # the queue for 5 minutes when someone navigates away
                         # before confirming ready.
-                        from app.game.state_machine import TurnState
                         if self.sm.state in (TurnState.MOVING, TurnState.DROPPING, TurnState.POST_DROP):
                             task = asyncio.create_task(
                                 self._disconnect_grace(entry_id, self.settings.queue_grace_period_seconds)
                             )
                             self._grace_tasks[entry_id] = task
 
-    async def _handle_message(self, entry_id: str, raw: str, ws: WebSocket):
+    async def _handle_message(self, entry_id: str, raw: str, conn: _PlayerConn):
+        ws = conn.ws
+        if raw == _LATENCY_PING:
+            await ws.send_text(_LATENCY_PONG)
+            return
         if len(raw) > self.settings.control_max_message_bytes:
             return  # Reject oversized messages
         try:
-            msg = json.loads(raw)
-        except json.JSONDecodeError:
+            msg = orjson.loads(raw)
+        except orjson.JSONDecodeError:
             return
 
         msg_type = msg.get("type")
 
         # Latency ping: respond immediately, bypass rate limit
         if msg_type == "latency_ping":
-            await ws.send_text(json.dumps({"type": "latency_pong"}))
+            await ws.send_text(_LATENCY_PONG)
             return
 
-        # Rate limit keydown events (held directions fire rapidly).
+        # Rate limit keydown events (held directions fire rapidly) with a
+        # token bucket, so a short burst of taps is not dropped.
         # drop_start, drop_end, keyup, and ready_confirm always pass through.
         if msg_type == "keydown":
             now = time.monotonic()
-            last = self._last_command_time.get(entry_id, 0)
-            min_interval = 1.0 / self.settings.command_rate_limit_hz
-            if now - last < min_interval:
+            tokens = min(_KEYDOWN_BURST, conn.tokens + (now - conn.tokens_at) * self.settings.command_rate_limit_hz)
+            conn.tokens_at = now
+            if tokens < 1.0:
+                conn.tokens = tokens
                 return  # Silently drop
-            self._last_command_time[entry_id] = now
+            conn.tokens = tokens - 1.0
 
         # Non-active player actions
         if entry_id != self.sm.active_entry_id:
@@ -184,19 +233,18 @@ class ControlHandler:
         # GPIO operations are wrapped so that a hardware error does not crash
         # the player's WebSocket connection — the turn continues and the
         # periodic checker will recover if the state machine gets stuck.
-        if msg_type == "keydown" and msg.get("key") in VALID_DIRECTIONS:
-            if self.sm.state.value == "moving":
+        if msg_type == "keydown":
+            acks = _CONTROL_ACKS.get(msg.get("key"))
+            if acks is not None and self.sm.state == TurnState.MOVING:
                 try:
                     ok = await self.gpio.direction_on(msg["key"])
                 except Exception:
                     logger.exception("GPIO error during direction_on")
                     ok = False
-                await ws.send_text(json.dumps({
-                    "type": "control_ack", "key": msg["key"], "active": ok
-                }))
+                await ws.send_text(acks[1 if ok else 0])
 
-        elif msg_type == "keyup" and msg.get("key") in VALID_DIRECTIONS:
-            if self.sm.state.value == "moving":
+        elif msg_type == "keyup":
+            if msg.get("key") in VALID_DIRECTIONS and self.sm.state == TurnState.MOVING:
                 try:
                     await self.gpio.direction_off(msg["key"])
                 except Exception:
@@ -215,7 +263,7 @@ class ControlHandler:
         """Wait for reconnection. If not reconnected, end turn."""
         try:
             await asyncio.sleep(grace_seconds)
-            if entry_id not in self._player_ws and entry_id == self.sm.active_entry_id:
+            if entry_id not in self._players and entry_id == self.sm.active_entry_id:
                 logger.info(f"Grace period expired for {entry_id}")
                 await self.sm.handle_disconnect_timeout(entry_id)
         except asyncio.CancelledError:
@@ -223,7 +271,7 @@ class ControlHandler:
         finally:
             self._grace_tasks.pop(entry_id, None)
 
-    async def _keepalive_ping(self, entry_id: str, ws: WebSocket):
+    async def _keepalive_ping(self, entry_id: str, conn: _PlayerConn):
         """Periodic ping for control channel liveness detection.
 
         Sends an application-level ping every control_ping_interval_s seconds.
@@ -231,12 +279,12 @@ class ControlHandler:
         control_liveness_timeout_s, the socket is presumed half-open and
         closed so disconnect handling fires promptly.
         """
+        ws = conn.ws
         try:
             while True:
                 await asyncio.sleep(self.settings.control_ping_interval_s)
                 # Check liveness: has any message arrived recently?
-                last = self._last_activity.get(entry_id, 0)
-                if time.monotonic() - last > self.settings.control_liveness_timeout_s:
+                if time.monotonic() - conn.last_activity > self.settings.control_liveness_timeout_s:
                     logger.warning(
                         "Control keepalive: no activity from %s for >%ds, closing",
                         entry_id, self.settings.control_liveness_timeout_s,
@@ -249,7 +297,7 @@ class ControlHandler:
                 # Send application-level ping
                 try:
                     await asyncio.wait_for(
-                        ws.send_text(json.dumps({"type": "ping"})),
+                        ws.send_text(_KEEPALIVE_PING),
                         timeout=self.settings.control_send_timeout_s,
                     )
                 except (asyncio.TimeoutError, Exception):
@@ -269,19 +317,38 @@ class ControlHandler:
         state-machine transitions.  On timeout or error the socket is
         closed and evicted immediately.
         """
-        ws = self._player_ws.get(entry_id)
-        if ws:
-            try:
-                await asyncio.wait_for(
-                    ws.send_text(json.dumps(message)), timeout=self.settings.control_send_timeout_s
-                )
-            except (asyncio.TimeoutError, Exception):
-                logger.warning("send_to_player: evicting dead socket for %s", entry_id)
-                self._player_ws.pop(entry_id, None)
-                try:
-                    await ws.close(1001, "Send timeout")
-                except Exception:
-                    pass
+        conn = self._players.get(entry_id)
+        if conn is None:
+            return
+        ws = conn.ws
+        try:
+            await asyncio.wait_for(ws.send_text(_dumps(message)), timeout=self.settings.control_send_timeout_s)
+        except (asyncio.TimeoutError, Exception):
+            await self._evict(entry_id, ws)
+
+    async def send_batch_to_player(self, entry_id: str, messages: list[dict]):
+        """Send several messages to a player back to back under one timeout."""
+        conn = self._players.get(entry_id)
+        if conn is None:
+            return
+        ws = conn.ws
+
+        async def _write_all():
+            for message in messages:
+                await ws.send_text(_dumps(message))
+
+        try:
+            await asyncio.wait_for(_write_all(), timeout=self.settings.control_send_timeout_s)
+        except (asyncio.TimeoutError, Exception):
+            await self._evict(entry_id, ws)
+
+    async def _evict(self, entry_id: str, ws: WebSocket):
+        logger.warning("send_to_player: evicting dead socket for %s", entry_id)
+        self._players.pop(entry_id, None)
+        try:
+            await ws.close(1001, "Send timeout")
+        except Exception:
+            pass
 
     async def send_latency_ping(self, entry_id: str):
         await self.send_to_player(entry_id, {
@@ -289,4 +356,40 @@ class ControlHandler:
         })
 
     def is_player_connected(self, entry_id: str) -> bool:
-        return entry_id in self._player_ws
+        return entry_id in self._players
+
+    async def wait_for_connection(self, entry_id: str, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for the player's control socket.
+
+        Returns True as soon as the player authenticates (immediately if
+        already connected), False on timeout.
+        """
+        if entry_id in self._players:
+            return True
+        event = self._connect_waiters.get(entry_id)
+        if event is None:
+            event = self._connect_waiters[entry_id] = asyncio.Event()
+        self._connect_waiter_counts[entry_id] = self._connect_waiter_counts.get(entry_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # The event is shared by every caller waiting on this entry; only
+            # the last one to leave removes it.  Once set it has already been
+            # removed by _wake_connect_waiters.
+            if self._connect_waiters.get(entry_id) is event:
+                remaining = self._connect_waiter_counts[entry_id] - 1
+                if remaining:
+                    self._connect_waiter_counts[entry_id] = remaining
+                else:
+                    del self._connect_waiters[entry_id]
+                    del self._connect_waiter_counts[entry_id]
+
+    def _wake_connect_waiters(self, entry_id: str):
+        """Release every wait_for_connection call pending on ``entry_id``."""
+        self._connect_waiter_counts.pop(entry_id, None)
+        waiter = self._connect_waiters.pop(entry_id, None)
+        if waiter:
+            waiter.set()
@@ -1,20 +1,40 @@
 """WebSocket Status Hub — broadcast-only channel for all viewers."""
 
 import asyncio
-import json
 import logging
+import time
 
+import orjson
 from fastapi import WebSocket
-from starlette.websockets import WebSocketState
 
 from app.config import settings
 
 logger = logging.getLogger("ws.status")
 
+# Keepalive frame as a prebuilt ASGI message, handed straight to
+# WebSocket.send().  It stays a text frame: viewers JSON.parse every frame
+# and would choke on a binary one.
+_PING_MESSAGE = {"type": "websocket.send", "text": '{"type":"ping"}'}
+
+
+def _dumps(obj) -> str:
+    # Broadcasts stay text: viewers JSON.parse every frame.
+    return orjson.dumps(obj).decode()
+
 
 class StatusHub:
     def __init__(self):
         self._clients: set[WebSocket] = set()
+        # Monotonic time of the last frame written to each viewer, so
+        # keepalive pings only go to connections with no recent traffic.
+        self._last_activity: dict[WebSocket, float] = {}
+        # Inputs and encoding of the last queue_update, reused when the next
+        # one repeats them: (status items, viewer count, entries, payload).
+        self._last_queue_update: tuple | None = None
+        # Encoded broadcasts queued during the current loop iteration and the
+        # task that will fan them out together on the next one.
+        self._pending: list[str] = []
+        self._flush_task: asyncio.Task | None = None
 
     async def connect(self, ws: WebSocket) -> bool:
         """Accept a viewer connection. Returns False if limit reached."""
@@ -24,11 +44,13 @@ class StatusHub:
             return False
         await ws.accept()
         self._clients.add(ws)
+        self._last_activity[ws] = time.monotonic()
         logger.info(f"Status viewer connected ({len(self._clients)} total)")
         return True
 
     def disconnect(self, ws: WebSocket):
         self._clients.discard(ws)
+        self._last_activity.pop(ws, None)
         logger.info(f"Status viewer disconnected ({len(self._clients)} total)")
 
     async def broadcast(self, message: dict):
@@ -36,21 +58,96 @@ class StatusHub:
 
         Each send has a per-client timeout so a single slow/stalled
         connection cannot block delivery to the remaining viewers.
+        Broadcasts made in the same event-loop iteration share one fan-out;
+        each is still its own frame, and all are flushed when this returns.
         """
         if not self._clients:
             return
-        payload = json.dumps(message)
+        await self._enqueue(_dumps(message))
+
+    async def _enqueue(self, *payloads: str):
+        self._pending.extend(payloads)
+        task = self._flush_task
+        if task is None:
+            task = self._flush_task = asyncio.create_task(self._flush_pending())
+        # Shielded: a cancelled caller must not drop the others' messages.
+        await asyncio.shield(task)
+
+    async def _flush_pending(self):
+        await asyncio.sleep(0)  # let the rest of this iteration's broadcasts join
+        payloads, self._pending = self._pending, []
+        self._flush_task = None
+        await self._send_payloads(payloads)
+
+    async def broadcast_batch(self, messages: list[dict]):
+        """Send several messages to every viewer in one pass.
+
+        Each message is encoded once and written to each client back to back
+        by a single sender under one timeout, so a burst of updates costs one
+        fan-out instead of one per message.  Frames are unchanged (one JSON
+        object per frame) and all writes are flushed when this returns.
+        The messages join any broadcasts already queued this iteration, so
+        ordering against them is kept.
+        """
+        if not self._clients or not messages:
+            return
+        await self._enqueue(*[_dumps(m) for m in messages])
+
+    async def _send_payloads(self, payloads: list[str]):
         dead = set()
+        last_activity = self._last_activity
+
+        async def _write_all(ws: WebSocket):
+            for payload in payloads:
+                await ws.send_text(payload)
 
         async def _send(ws: WebSocket):
+            # No connection-state check: writing to a closed socket raises,
+            # which evicts it below like any other failed send.
             try:
-                if ws.client_state == WebSocketState.CONNECTED:
-                    await asyncio.wait_for(ws.send_text(payload), timeout=settings.status_send_timeout_s)
+                await asyncio.wait_for(_write_all(ws), timeout=settings.status_send_timeout_s)
+                last_activity[ws] = time.monotonic()
             except Exception:
                 dead.add(ws)
 
         await asyncio.gather(*[_send(ws) for ws in self._clients])
         self._clients -= dead
+        for ws in dead:
+            last_activity.pop(ws, None)
+
+    async def ping_idle(self, idle_seconds: float):
+        """Ping every viewer that has received nothing for ``idle_seconds``.
+
+        Keeps intermediate proxies and firewalls from killing idle viewer
+        connections (important for internet users behind corporate NATs or
+        CDN edge nodes).  Broadcasts reset the idle clock, so busy viewers
+        are never pinged.  A viewer whose ping fails is closed and dropped.
+        """
+        now = time.monotonic()
+        idle = [
+            ws for ws in self._clients
+            if now - self._last_activity.get(ws, 0.0) >= idle_seconds
+        ]
+        if not idle:
+            return
+
+        async def _ping(ws: WebSocket):
+            try:
+                await asyncio.wait_for(
+                    ws.send(_PING_MESSAGE),
+                    timeout=settings.status_send_timeout_s,
+                )
+                self._last_activity[ws] = time.monotonic()
+            except Exception:
+                logger.warning("Status WS keepalive: ping send failed, closing")
+                self._clients.discard(ws)
+                self._last_activity.pop(ws, None)
+                try:
+                    await ws.close(1001, "Keepalive send failed")
+                except Exception:
+                    pass
+
+        await asyncio.gather(*[_ping(ws) for ws in idle])
 
     async def broadcast_state(self, state, payload: dict):
         await self.broadcast({"type": "state_update", **payload})
@@ -59,10 +156,26 @@ class StatusHub:
         await self.broadcast({"type": "turn_end", "entry_id": entry_id, "result": result})
 
     async def broadcast_queue_update(self, status: dict, queue_entries: list[dict] | None = None):
-        msg = {"type": "queue_update", **status, "viewer_count": self.viewer_count}
-        if queue_entries is not None:
-            msg["entries"] = queue_entries
-        await self.broadcast(msg)
+        """Broadcast a ``queue_update``.
+
+        The entries list is matched by identity: QueueManager hands out the
+        same cached list until the queue changes, so a repeated update with
+        equal status and viewer count reuses the previous encoding.
+        """
+        if not self._clients:
+            return
+        status_items = tuple(status.items())
+        count = self.viewer_count
+        last = self._last_queue_update
+        if last is not None and last[2] is queue_entries and last[0] == status_items and last[1] == count:
+            payload = last[3]
+        else:
+            msg = {"type": "queue_update", **status, "viewer_count": count}
+            if queue_entries is not None:
+                msg["entries"] = queue_entries
+            payload = _dumps(msg)
+            self._last_queue_update = (status_items, count, queue_entries, payload)
+        await self._enqueue(payload)
 
     async def notify_player_ready(self, entry_id: str):
         # Actual notification goes through ControlHandler.
@@ -1,10 +1,14 @@
 """Test configuration — sets up mock GPIO and temp database."""
 
 import os
+import tempfile
 
 # Force mock GPIO for all tests — must be set before any app imports
 os.environ["MOCK_GPIO"] = "true"
 os.environ["GPIOZERO_PIN_FACTORY"] = "mock"
+# Keep the project .env out of the tests: settings are not loaded from it,
+# and admin config saves land in a throwaway file instead.
+os.environ["REMOTE_CLAW_ENV_FILE"] = os.path.join(tempfile.mkdtemp(prefix="eclaw-test-"), ".env")
 
 import pytest  # noqa: E402
 
@@ -10,12 +10,14 @@ These tests exercise failure modes identified in the reliability audit:
 """
 
 import asyncio
+import json
 import os
 import time
 
 import pytest
 from fastapi import HTTPException
 from httpx import ASGITransport, AsyncClient
+from starlette.websockets import WebSocketState
 
 import app.database as db_module
 from app.config import settings
@@ -24,7 +26,8 @@ from app.game.state_machine import StateMachine, TurnState
 from app.gpio.controller import GPIOController
 from app.main import app
 from app.api.routes import _join_limits
-from app.ws.control_handler import ControlHandler
+from app.ws.control_handler import ControlHandler, _PlayerConn
+from app.ws.status_hub import StatusHub
 
 
 # ---------------------------------------------------------------------------
@@ -110,6 +113,7 @@ class _MockQueue:
     def __init__(self):
         self._entries = []
         self._completed = []
+        self.generation = 0
 
     async def peek_next_waiting(self):
         for e in self._entries:
@@ -141,6 +145,9 @@ class _MockQueue:
     async def list_queue(self):
         return []
 
+    async def get_cached_payload(self):
+        return []
+
     async def get_waiting_count(self):
         return sum(1 for e in self._entries if e["state"] == "waiting")
 
@@ -170,9 +177,18 @@ class _MockCtrl:
             await asyncio.sleep(999)  # simulate blocked send
         self.sent.append((entry_id, message))
 
+    async def send_batch_to_player(self, entry_id, messages):
+        for message in messages:
+            await self.send_to_player(entry_id, message)
+
     def is_player_connected(self, entry_id):
         return entry_id in self._connected
 
+    async def wait_for_connection(self, entry_id, timeout):
+        if entry_id not in self._connected:
+            await asyncio.sleep(timeout)
+        return entry_id in self._connected
+
 
 def _make_sm(gpio=None, queue=None, ws=None, ctrl=None):
     """Create a StateMachine with mock collaborators."""
@@ -204,7 +220,7 @@ async def test_send_to_player_timeout_evicts_socket():
             self.closed = True
 
     ws = _StallSocket()
-    ctrl._player_ws["test-entry"] = ws
+    ctrl._players["test-entry"] = _PlayerConn(ws)
 
     # send_to_player should NOT hang — it should time out and evict
     await asyncio.wait_for(
@@ -212,10 +228,38 @@ async def test_send_to_player_timeout_evicts_socket():
         timeout=5.0,
     )
 
-    assert "test-entry" not in ctrl._player_ws
+    assert "test-entry" not in ctrl._players
     assert ws.closed
 
 
+@pytest.mark.anyio
+async def test_keydown_rate_limit_allows_short_burst():
+    """A burst of taps up to the bucket size passes; the rest are dropped."""
+    class _SM:
+        active_entry_id = "p1"
+        state = TurnState.MOVING
+
+    class _CountingGPIO(_MockGPIO):
+        presses = 0
+
+        async def direction_on(self, key):
+            self.presses += 1
+            return True
+
+    class _Socket:
+        async def send_text(self, data):
+            pass
+
+    gpio = _CountingGPIO()
+    ctrl = ControlHandler(_SM(), _MockQueue(), gpio, settings)
+    conn = _PlayerConn(_Socket())
+    msg = json.dumps({"type": "keydown", "key": "north"})
+    for _ in range(10):
+        await ctrl._handle_message("p1", msg, conn)
+
+    assert gpio.presses == 4
+
+
 # ===========================================================================
 # Test 2: GPIO executor timeout and recovery
 # ===========================================================================
@@ -466,6 +510,47 @@ async def test_ghost_player_skipped(api_client):
     assert status.status_code == 200
 
 
+@pytest.mark.anyio
+async def test_ghost_candidate_skips_connection_wait():
+    """A ghost at the head of the queue should be skipped without first
+    sitting through the ~2 s pre-flight connection wait."""
+    queue = _MockQueue()
+    queue._entries = [
+        {"id": "ghost", "state": "waiting", "name": "Ghost", "position": 1,
+         "created_at": "2025-01-01T00:00:00"}
+    ]
+    sm = _make_sm(queue=queue)
+
+    start = time.monotonic()
+    await asyncio.wait_for(sm.advance_queue(), timeout=5.0)
+
+    assert time.monotonic() - start < 1.0
+    assert queue._completed == [("ghost", "skipped", 0)]
+
+
+@pytest.mark.anyio
+async def test_ghost_skip_cascade_broadcasts_queue_once():
+    """Skipping several ghost players back-to-back should emit one turn_end
+    per ghost but only a single coalesced queue_update."""
+    queue = _MockQueue()
+    queue._entries = [
+        {"id": f"ghost-{i}", "state": "waiting", "name": f"Ghost{i}", "position": i,
+         "created_at": "2025-01-01T00:00:00"}
+        for i in range(3)
+    ]
+    ws = _MockWS()
+    sm = _make_sm(queue=queue, ws=ws)
+
+    await asyncio.wait_for(sm.advance_queue(), timeout=10.0)
+
+    assert sm.state == TurnState.IDLE
+    assert [r for _, r, _ in queue._completed] == ["skipped"] * 3
+    kinds = [b[0] for b in ws.broadcasts]
+    assert kinds.count("turn_end") == 3
+    assert kinds.count("queue_update") == 1
+    assert kinds[-1] == "queue_update"
+
+
 # ===========================================================================
 # Test 8: Keepalive constants are configured correctly
 # ===========================================================================
@@ -541,21 +626,68 @@ async def test_periodic_check_detects_stuck_moving(api_client):
     sm._last_state_change = time.monotonic() - 9999  # Way past any timeout
 
     # Trigger the periodic check manually
-    from app.main import _periodic_queue_check
+    from app.main import _queue_check
     # Run a single iteration by calling the check logic directly
-    check_task = asyncio.create_task(_periodic_queue_check(sm, interval_seconds=0))
-    await asyncio.sleep(0.3)
-    check_task.cancel()
-    try:
-        await check_task
-    except asyncio.CancelledError:
-        pass
+    await _queue_check(sm)
 
     # SM should have recovered to IDLE
     assert sm.state == TurnState.IDLE
     assert sm.active_entry_id is None
 
 
+@pytest.mark.anyio
+async def test_periodic_check_skips_lookup_until_queue_changes():
+    """The active entry is looked up once per turn/queue generation; a
+    queue write makes the next check look again and catch a cancel."""
+    from app.main import _queue_check
+
+    queue = _MockQueue()
+    queue._entries = [{"id": "e1", "state": "active"}]
+    lookups = []
+    get_by_id = queue.get_by_id
+
+    async def _counting_get_by_id(entry_id):
+        lookups.append(entry_id)
+        return await get_by_id(entry_id)
+
+    queue.get_by_id = _counting_get_by_id
+    sm = _make_sm(queue=queue)
+    sm.state = TurnState.MOVING
+    sm.active_entry_id = "e1"
+    sm._last_state_change = time.monotonic()
+
+    verified = await _queue_check(sm)
+    verified = await _queue_check(sm, verified)
+    assert lookups == ["e1"]
+    assert sm.state == TurnState.MOVING
+
+    queue._entries[0]["state"] = "cancelled"
+    queue.generation += 1
+    await _queue_check(sm, verified)
+    assert lookups == ["e1", "e1"]
+    assert sm.state == TurnState.IDLE
+
+
+@pytest.mark.anyio
+async def test_turn_end_watchdog_forces_recovery():
+    """A TURN_END that outlives turn_end_stuck_timeout_s is recovered by
+    the one-shot watchdog without waiting for the periodic check."""
+    original = settings.turn_end_stuck_timeout_s
+    settings.turn_end_stuck_timeout_s = 0.05
+    try:
+        sm = _make_sm()
+        sm.state = TurnState.TURN_END
+        sm.active_entry_id = "stuck-turn-end"
+        sm._arm_turn_end_watchdog()
+        await asyncio.sleep(0.3)
+    finally:
+        settings.turn_end_stuck_timeout_s = original
+
+    assert sm.state == TurnState.IDLE
+    assert sm.active_entry_id is None
+    assert sm._turn_end_watchdog is None
+
+
 # ===========================================================================
 # Test 12: _enter_state completes when control send blocks
 # ===========================================================================
@@ -574,7 +706,7 @@ async def test_enter_state_bounded_with_real_ctrl():
             pass
 
     # Register a stalled socket for the player
-    real_ctrl._player_ws["player1"] = _StallSocket()
+    real_ctrl._players["player1"] = _PlayerConn(_StallSocket())
 
     queue = _MockQueue()
     queue._entries = [
@@ -591,7 +723,7 @@ async def test_enter_state_bounded_with_real_ctrl():
     assert sm.state == TurnState.READY_PROMPT
     assert sm.active_entry_id == "player1"
     # Stalled socket should have been evicted
-    assert "player1" not in real_ctrl._player_ws
+    assert "player1" not in real_ctrl._players
 
 
 @pytest.mark.anyio
@@ -606,7 +738,7 @@ async def test_end_turn_bounded_with_stalled_socket():
         async def close(self, code=1000, reason=""):
             pass
 
-    real_ctrl._player_ws["player1"] = _StallSocket()
+    real_ctrl._players["player1"] = _PlayerConn(_StallSocket())
 
     queue = _MockQueue()
     queue._entries = [
@@ -631,61 +763,189 @@ async def test_end_turn_bounded_with_stalled_socket():
     assert len(queue._completed) == 1
 
 
+@pytest.mark.anyio
+async def test_end_turn_releases_sm_lock_during_notify():
+    """_end_turn should not hold _sm_lock while notifying the player."""
+    ctrl = _MockCtrl()
+    release = asyncio.Event()
+    notified = asyncio.Event()
+
+    async def _slow_send(entry_id, message):
+        notified.set()
+        await release.wait()
+        ctrl.sent.append((entry_id, message))
+
+    ctrl.send_to_player = _slow_send
+    queue = _MockQueue()
+    sm = _make_sm(ctrl=ctrl, queue=queue)
+    sm.state = TurnState.MOVING
+    sm.active_entry_id = "e1"
+    sm.current_try = 2
+
+    async def _end():
+        async with sm._sm_lock:
+            await sm._end_turn("loss")
+
+    task = asyncio.create_task(_end())
+    await asyncio.wait_for(notified.wait(), timeout=5.0)
+
+    assert not sm._sm_lock.locked()
+    assert sm.state == TurnState.TURN_END
+    assert sm.active_entry_id is None
+
+    release.set()
+    await asyncio.wait_for(task, timeout=5.0)
+
+    assert sm.state == TurnState.IDLE
+    assert not sm._sm_lock.locked()
+    assert queue._completed == [("e1", "loss", 2)]
+    assert ctrl.sent[0][1]["tries_used"] == 2
+
+
 # ===========================================================================
 # Test 13: advance_queue lock hold time is reduced
 # ===========================================================================
 
 @pytest.mark.anyio
-async def test_advance_queue_lock_not_held_during_ws_wait():
-    """The _advance_lock should not be held during the ~2s WebSocket
-    connection wait, so concurrent callers aren't blocked."""
+async def test_advance_queue_guard_not_held_during_ws_wait():
+    """The in-progress guard should not be set during the ~2s WebSocket
+    connection wait, so concurrent callers aren't turned away."""
     ctrl = _MockCtrl()
     # Player is NOT connected — triggers the wait path
     queue = _MockQueue()
+    # Recently joined (not a ghost), so the pre-flight wait applies
+    from datetime import datetime, timezone
     queue._entries = [
         {"id": "slow-player", "state": "waiting", "name": "Slow", "position": 1,
-         "created_at": "2025-01-01T00:00:00"}
+         "created_at": datetime.now(timezone.utc).isoformat()}
     ]
     sm = _make_sm(ctrl=ctrl, queue=queue)
 
-    lock_acquired = asyncio.Event()
-    lock_released = asyncio.Event()
-
-    async def _try_lock():
-        """Try to acquire the lock while advance_queue is running."""
-        async with sm._advance_lock:
-            lock_acquired.set()
-        lock_released.set()
-
-    # Start advance_queue (will do pre-flight wait ~2s outside lock)
+    # Start advance_queue (will do pre-flight wait ~2s outside the guard)
     advance_task = asyncio.create_task(sm.advance_queue())
 
     # Small delay to let the pre-flight wait start
     await asyncio.sleep(0.2)
+    guard_set_during_wait = sm._advance_running
 
-    # Try to acquire the lock — should succeed quickly if wait is outside lock
-    lock_task = asyncio.create_task(_try_lock())
-    try:
-        await asyncio.wait_for(lock_acquired.wait(), timeout=1.0)
-        acquired_during_wait = True
-    except asyncio.TimeoutError:
-        acquired_during_wait = False
-
-    # Clean up
     advance_task.cancel()
-    lock_task.cancel()
     try:
         await advance_task
     except asyncio.CancelledError:
         pass
-    try:
-        await lock_task
-    except asyncio.CancelledError:
-        pass
 
-    # The lock should have been acquirable during the pre-flight wait
-    assert acquired_during_wait, \
-        "_advance_lock was held during WS connection wait (should be outside lock)"
+    assert not guard_set_during_wait, \
+        "advance guard was held during WS connection wait (should be outside)"
+
+
+@pytest.mark.anyio
+async def test_concurrent_advance_defers_to_running_one():
+    """A call that finds an advance in progress returns at once and the
+    running advance schedules one follow-up pass when it finishes."""
+    sm = _make_sm()
+    sm._advance_running = True
+    scheduled = []
+    sm._schedule_advance = lambda: scheduled.append(True)
+
+    await asyncio.wait_for(sm.advance_queue(), timeout=1.0)
+    assert sm._advance_pending
+    assert not scheduled
+
+    # Simulate the in-flight advance finishing.
+    sm._advance_running = False
+    await sm.advance_queue()
+    assert not sm._advance_pending
+    assert scheduled == [True]
+
+
+# ===========================================================================
+# Test: queue payload cache is invalidated by queue writes
+# ===========================================================================
+
+@pytest.mark.anyio
+async def test_queue_payload_cache_invalidated_on_write(fresh_db):
+    """get_cached_payload() should reuse its snapshot until a queue write."""
+    from app.game.queue_manager import QueueManager
+
+    qm = QueueManager()
+    alice = await qm.join("Alice", "alice@test.com", "10.0.0.1")
+    await qm.join("Bob", "bob@test.com", "10.0.0.2")
+
+    first = await qm.get_cached_payload()
+    assert [e["name"] for e in first] == ["Alice", "Bob"]
+    assert await qm.get_cached_payload() is first
+
+    await qm.set_state(alice["id"], "ready")
+    second = await qm.get_cached_payload()
+    assert second is not first
+    assert second[0] == {"name": "Alice", "state": "ready", "position": 1}
+
+    await qm.complete_entry(alice["id"], "loss", 1)
+    assert [e["name"] for e in await qm.get_cached_payload()] == ["Bob"]
+
+
+@pytest.mark.anyio
+async def test_token_lookup_cached_until_queue_write(fresh_db):
+    """get_by_token() should reuse its result until the next queue write."""
+    from app.database import hash_token
+    from app.game.queue_manager import QueueManager
+
+    qm = QueueManager()
+    alice = await qm.join("Alice", "alice@test.com", "10.0.0.1")
+    token_hash = hash_token(alice["token"])
+
+    first = await qm.get_by_token(token_hash)
+    assert first["state"] == "waiting"
+    assert await qm.get_by_token(token_hash) is first
+    assert await qm.get_by_token(hash_token("bogus")) is None
+
+    await qm.set_state(alice["id"], "ready")
+    second = await qm.get_by_token(token_hash)
+    assert second is not first
+    assert second["state"] == "ready"
+
+    await qm.complete_entry(alice["id"], "loss", 1)
+    done = await qm.get_by_token(token_hash)
+    assert done["state"] == "done"
+    assert await qm.get_by_token(token_hash) is not done
+
+
+@pytest.mark.anyio
+async def test_wait_for_connection_wakes_on_connect():
+    """wait_for_connection should return as soon as the player connects,
+    not after the full timeout."""
+    ctrl = ControlHandler(None, _MockQueue(), _MockGPIO(), settings)
+
+    async def _connect_soon():
+        await asyncio.sleep(0.05)
+        ctrl._players["p1"] = _PlayerConn(object())
+        ctrl._wake_connect_waiters("p1")
+
+    start = time.monotonic()
+    asyncio.create_task(_connect_soon())
+    assert await ctrl.wait_for_connection("p1", timeout=5.0) is True
+    assert time.monotonic() - start < 1.0
+
+    assert await ctrl.wait_for_connection("p2", timeout=0.05) is False
+    assert ctrl._connect_waiters == {}
+
+
+@pytest.mark.anyio
+async def test_wait_for_connection_shared_by_concurrent_callers():
+    """A caller that times out must not strand others still waiting on the
+    same entry."""
+    ctrl = ControlHandler(None, _MockQueue(), _MockGPIO(), settings)
+
+    short = asyncio.create_task(ctrl.wait_for_connection("p1", timeout=0.05))
+    long = asyncio.create_task(ctrl.wait_for_connection("p1", timeout=5.0))
+    assert await short is False
+    assert "p1" in ctrl._connect_waiters
+
+    ctrl._players["p1"] = _PlayerConn(object())
+    ctrl._wake_connect_waiters("p1")
+    assert await long is True
+    assert ctrl._connect_waiters == {}
+    assert ctrl._connect_waiter_counts == {}
 
 
 # ===========================================================================
@@ -742,6 +1002,42 @@ async def test_rate_limiter_cleanup(fresh_db):
         assert row[0] == 0
 
 
+@pytest.mark.anyio
+async def test_prune_all(fresh_db):
+    """prune_all should remove old completed entries, their events and old
+    rate limit records, and keep everything still in use."""
+    from app.database import get_db, prune_all
+
+    db = await get_db()
+    db_module._ensure_locks()
+    async with db_module._write_lock:
+        await db.execute(
+            "INSERT INTO queue_entries (id, token_hash, name, email, state, completed_at) "
+            "VALUES ('old', 'h1', 'Old', 'old@x.com', 'done', datetime('now', '-3 hours'))"
+        )
+        await db.execute(
+            "INSERT INTO queue_entries (id, token_hash, name, email, state) "
+            "VALUES ('live', 'h2', 'Live', 'live@x.com', 'waiting')"
+        )
+        await db.execute(
+            "INSERT INTO game_events (queue_entry_id, event_type) VALUES ('old', 'join')"
+        )
+        await db.execute(
+            "INSERT INTO rate_limits (key, ts) VALUES (?, datetime('now', '-2 hours'))",
+            ("ip:old",),
+        )
+        await db.commit()
+
+    await prune_all(1, 3600)
+
+    async with db.execute("SELECT id FROM queue_entries") as cur:
+        assert [r[0] for r in await cur.fetchall()] == ["live"]
+    async with db.execute("SELECT COUNT(*) FROM game_events") as cur:
+        assert (await cur.fetchone())[0] == 0
+    async with db.execute("SELECT COUNT(*) FROM rate_limits") as cur:
+        assert (await cur.fetchone())[0] == 0
+
+
 # ===========================================================================
 # Test: keepalive ping send failure closes the socket
 # ===========================================================================
@@ -764,16 +1060,50 @@ async def test_keepalive_ping_send_fail_closes_socket():
 
     ws = _FailSendSocket()
     entry_id = "ping-fail-entry"
-    ctrl._player_ws[entry_id] = ws
-    ctrl._last_activity[entry_id] = time.monotonic()
+    conn = ctrl._players[entry_id] = _PlayerConn(ws)
 
     # Run keepalive — it should attempt to send a ping, fail, close ws, then return
-    await ctrl._keepalive_ping(entry_id, ws)
+    await ctrl._keepalive_ping(entry_id, conn)
 
     assert ws.closed, "Socket should be closed after ping send failure"
     assert ws.close_code == 1001
 
 
+@pytest.mark.anyio
+async def test_status_hub_pings_only_idle_viewers():
+    """The status keepalive sweep should skip viewers with recent traffic
+    and close viewers whose ping fails."""
+    from app.ws.status_hub import StatusHub
+
+    class _Socket:
+        def __init__(self, fail=False):
+            self.fail = fail
+            self.sent = []
+            self.close_code = None
+
+        async def send(self, message):
+            if self.fail:
+                raise ConnectionError("broken pipe")
+            self.sent.append(message["text"])
+
+        async def close(self, code=1000, reason=""):
+            self.close_code = code
+
+    hub = StatusHub()
+    busy, idle, broken = _Socket(), _Socket(), _Socket(fail=True)
+    now = time.monotonic()
+    for ws, last in ((busy, now), (idle, now - 100), (broken, now - 100)):
+        hub._clients.add(ws)
+        hub._last_activity[ws] = last
+
+    await hub.ping_idle(30)
+
+    assert busy.sent == []
+    assert idle.sent == ['{"type":"ping"}']
+    assert broken.close_code == 1001
+    assert hub._clients == {busy, idle}
+
+
 # ===========================================================================
 # Test: admin kick waiting entry broadcasts queue update
 # ===========================================================================
@@ -895,12 +1225,9 @@ async def test_gpio_circuit_breaker_resets_after_window():
 @pytest.mark.anyio
 async def test_ws_semaphore_not_held_during_auth_timeout():
     """An unauthenticated connection that times out should NOT consume
-    a semaphore slot."""
+    a connection slot."""
     ctrl = ControlHandler(None, _MockQueue(), _MockGPIO(), settings)
 
-    # Use a small semaphore to make the test sensitive
-    ctrl._conn_sem = asyncio.Semaphore(1)
-
     class _SlowAuthSocket:
         """Simulates a client that connects but never sends auth."""
         accepted = False
@@ -931,9 +1258,9 @@ async def test_ws_semaphore_not_held_during_auth_timeout():
     finally:
         settings.control_pre_auth_timeout_s = original_timeout
 
-    # The semaphore should still be available (not leaked)
-    assert not ctrl._conn_sem.locked(), \
-        "Semaphore was consumed by unauthenticated connection"
+    # The slot should still be available (not leaked)
+    assert ctrl._connections == 0, \
+        "Slot was consumed by unauthenticated connection"
     assert ws.accepted, "WebSocket should have been accepted"
     assert ws.closed, "WebSocket should have been closed after auth timeout"
 
@@ -956,3 +1283,280 @@ async def test_single_worker_guard_rejects_multi_worker():
             os.environ.pop("WEB_CONCURRENCY", None)
         else:
             os.environ["WEB_CONCURRENCY"] = original
+
+
+@pytest.mark.anyio
+async def test_status_broadcast_batch_sends_in_order_and_evicts_stalled():
+    """broadcast_batch writes every message to each viewer in order and
+    drops a stalled viewer without delaying the others."""
+    class _Socket:
+        client_state = WebSocketState.CONNECTED
+
+        def __init__(self, stall=False):
+            self.frames = []
+            self._stall = stall
+
+        async def send_text(self, data):
+            if self._stall:
+                await asyncio.sleep(999)
+            self.frames.append(json.loads(data))
+
+    hub = StatusHub()
+    good, stalled = _Socket(), _Socket(stall=True)
+    hub._clients = {good, stalled}
+
+    await asyncio.wait_for(
+        hub.broadcast_batch([{"type": "turn_end"}, {"type": "queue_update"}]),
+        timeout=settings.status_send_timeout_s + 2,
+    )
+
+    assert [m["type"] for m in good.frames] == ["turn_end", "queue_update"]
+    assert hub._clients == {good}
+
+
+@pytest.mark.anyio
+async def test_repeated_queue_update_reuses_encoding():
+    """A queue_update with the same entries list and status is encoded once."""
+    class _Socket:
+        client_state = WebSocketState.CONNECTED
+
+        def __init__(self):
+            self.frames = []
+
+        async def send_text(self, data):
+            self.frames.append(data)
+
+    hub = StatusHub()
+    ws = _Socket()
+    hub._clients = {ws}
+    entries = [{"name": "Alice", "state": "waiting", "position": 1}]
+    status = {"queue_length": 1, "current_player": None, "current_player_state": None}
+
+    await hub.broadcast_queue_update(status, entries)
+    await hub.broadcast_queue_update(dict(status), entries)
+    await hub.broadcast_queue_update({**status, "queue_length": 2}, entries)
+
+    assert ws.frames[1] is ws.frames[0]
+    assert json.loads(ws.frames[0])["entries"] == entries
+    assert json.loads(ws.frames[2])["queue_length"] == 2
+
+
+@pytest.mark.anyio
+async def test_same_tick_broadcasts_share_one_fan_out():
+    """Broadcasts made together are sent in one pass, in call order."""
+    class _Socket:
+        client_state = WebSocketState.CONNECTED
+
+        def __init__(self):
+            self.frames = []
+
+        async def send_text(self, data):
+            self.frames.append(json.loads(data))
+
+    hub = StatusHub()
+    ws = _Socket()
+    hub._clients = {ws}
+    fan_outs = []
+    send_payloads = hub._send_payloads
+
+    async def _counting(payloads):
+        fan_outs.append(len(payloads))
+        await send_payloads(payloads)
+
+    hub._send_payloads = _counting
+    await asyncio.gather(
+        hub.broadcast({"type": "turn_end"}),
+        hub.broadcast_queue_update({"queue_length": 0}, []),
+        hub.broadcast_batch([{"type": "ready_prompt"}, {"type": "latency_ping"}]),
+        hub.broadcast({"type": "state_update"}),
+    )
+
+    assert fan_outs == [5]
+    assert [m["type"] for m in ws.frames] == [
+        "turn_end", "queue_update", "ready_prompt", "latency_ping", "state_update",
+    ]
+
+
+@pytest.mark.anyio
+async def test_deadline_writes_are_buffered_and_flushed(fresh_db):
+    """_write_deadlines only buffers; the flusher persists the latest value
+    per entry, and close() flushes anything still pending."""
+    from app.game.queue_manager import QueueManager
+
+    qm = QueueManager()
+    entry = await qm.join("Alice", "alice@test.com", "10.0.0.1")
+    sm = _make_sm(queue=qm)
+    sm.active_entry_id = entry["id"]
+    sm._turn_deadline = time.monotonic() + 60
+
+    sm._state_deadline = time.monotonic() + 30
+    sm._write_deadlines()
+    sm._state_deadline = time.monotonic() + 10
+    sm._write_deadlines()
+    assert list(sm._deadline_buf) == [entry["id"]]
+
+    await sm.close()
+    assert sm._deadline_buf == {}
+
+    cur = await fresh_db.execute(
+        "SELECT try_move_end_at, turn_end_at FROM queue_entries WHERE id = ?",
+        (entry["id"],),
+    )
+    move_end, turn_end = await cur.fetchone()
+    assert move_end is not None and turn_end is not None
+    assert move_end < turn_end
+
+
+@pytest.mark.anyio
+async def test_gpio_worker_runs_calls_in_order_and_reports_errors():
+    """The GPIO worker thread runs submissions FIFO, and a raising call
+    fails only that _gpio_call."""
+    gpio = GPIOController()
+    order = []
+
+    def _boom():
+        raise OSError("lgpio error")
+
+    results = await asyncio.gather(
+        gpio._gpio_call(order.append, 1),
+        gpio._gpio_call(_boom),
+        gpio._gpio_call(order.append, 2),
+    )
+
+    assert results == [True, False, True]
+    assert order == [1, 2]
+
+
+@pytest.mark.anyio
+async def test_all_directions_off_releases_holds_in_one_call():
+    """all_directions_off cancels every hold and turns the relays off with
+    a single output call."""
+    gpio = GPIOController()
+    await gpio.initialize()
+    assert await gpio.direction_on("north")
+    assert await gpio.direction_on("east")
+
+    calls = []
+    real_call = gpio._output_call
+
+    async def _counting_call(func, *args):
+        calls.append(func)
+        return await real_call(func, *args)
+
+    gpio._output_call = _counting_call
+    await gpio.all_directions_off()
+
+    assert len(calls) == 1
+    assert gpio.active_directions == []
+    assert not gpio._outputs["north"].value
+    assert not gpio._outputs["east"].value
+
+
+@pytest.mark.anyio
+async def test_pulse_does_not_block_other_gpio_calls():
+    """While a pulse is held, other GPIO operations still run; the pin is
+    released when the pulse completes."""
+    gpio = GPIOController()
+    await gpio.initialize()
+
+    pulse_task = asyncio.create_task(gpio.pulse("coin"))
+    await asyncio.sleep(0.02)
+    assert gpio._outputs["coin"].value
+
+    assert await asyncio.wait_for(gpio.direction_on("north"), timeout=settings.coin_pulse_ms / 2000)
+    assert not pulse_task.done()
+
+    assert await pulse_task is True
+    assert not gpio._outputs["coin"].value
+    await gpio.all_directions_off()
+
+
+@pytest.mark.anyio
+async def test_emergency_stop_waits_out_pulses():
+    """emergency_stop leaves no pulse pin on: an in-flight pulse finishes
+    first and a pulse still waiting on its pin lock gives up."""
+    gpio = GPIOController()
+    await gpio.initialize()
+
+    running = asyncio.create_task(gpio.pulse("coin"))
+    await asyncio.sleep(0.02)
+    assert gpio._outputs["coin"].value
+
+    drop_lock = gpio._pulse_locks["drop"]
+    await drop_lock.acquire()
+    waiting = asyncio.create_task(gpio.pulse("drop"))
+    await asyncio.sleep(0)
+    stop = asyncio.create_task(gpio.emergency_stop())
+    await asyncio.sleep(0)
+    drop_lock.release()
+    await asyncio.wait_for(stop, timeout=2.0)
+
+    assert running.done()
+    assert await waiting is False
+    assert not gpio._outputs["coin"].value
+    assert not gpio._outputs["drop"].value
+
+
+@pytest.mark.anyio
+async def test_direction_hold_opposites_and_timeout():
+    """Pressing the opposite direction releases the first (replace mode),
+    and the hold timeout turns the relay off."""
+    gpio = GPIOController()
+    await gpio.initialize()
+    original = (settings.direction_conflict_mode, settings.direction_hold_max_ms)
+    settings.direction_conflict_mode = "replace"
+    settings.direction_hold_max_ms = 50
+    try:
+        assert await gpio.direction_on("north")
+        assert await gpio.direction_on("south")
+        assert gpio.active_directions == ["south"]
+        assert not gpio._outputs["north"].value
+        assert await gpio.direction_on("bogus") is False
+
+        await asyncio.sleep(0.2)
+        assert gpio.active_directions == []
+        assert not gpio._outputs["south"].value
+    finally:
+        settings.direction_conflict_mode, settings.direction_hold_max_ms = original
+
+
+@pytest.mark.anyio
+async def test_direction_off_skips_gpio_when_already_off():
+    """Releasing a direction that is not held and already confirmed off
+    sends nothing; a held direction is still switched off."""
+    gpio = GPIOController()
+    await gpio.initialize()
+    calls = []
+    real_call = gpio._output_call
+
+    async def _counting_call(func, *args):
+        calls.append(func)
+        return await real_call(func, *args)
+
+    gpio._output_call = _counting_call
+
+    assert await gpio.direction_off("west") is True
+    assert calls == []
+
+    assert await gpio.direction_on("west")
+    assert await gpio.direction_off("west")
+    assert len(calls) == 2
+    assert not gpio._outputs["west"].value
+    assert await gpio.direction_off("west")
+    assert len(calls) == 2
+
+
+@pytest.mark.anyio
+async def test_mock_outputs_skip_the_worker_thread():
+    """With mock GPIO, output on/off runs inline without a worker hop."""
+    gpio = GPIOController()
+    await gpio.initialize()
+
+    def _no_submit(*_args):
+        raise AssertionError("mock output call went through the worker")
+
+    gpio._executor.submit = _no_submit
+    assert await gpio.direction_on("east")
+    assert gpio._outputs["east"].value
+    await gpio.emergency_stop()
+    assert not gpio._outputs["east"].value
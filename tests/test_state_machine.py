@@ -1,6 +1,7 @@
 """State machine edge-case tests."""
 
 import asyncio
+import time
 
 import pytest
 
@@ -45,6 +46,9 @@ class _DummyQueue:
     async def list_queue(self):
         return []
 
+    async def get_cached_payload(self):
+        return []
+
 
 class _DummyWS:
     async def broadcast_state(self, *_args, **_kwargs):
@@ -61,6 +65,9 @@ class _DummyCtrl:
     async def send_to_player(self, *_args, **_kwargs):
         return None
 
+    async def send_batch_to_player(self, *_args, **_kwargs):
+        return None
+
 
 class _DummySettings:
     tries_per_player = 2
@@ -70,6 +77,7 @@ class _DummySettings:
     try_move_seconds = 30
     post_drop_wait_seconds = 8
     post_drop_wait_no_sensor_seconds = 3
+    turn_end_stuck_timeout_s = 30
 
 
 @pytest.mark.anyio
@@ -121,6 +129,107 @@ async def test_post_drop_without_sensor_ends_as_loss():
     sm.active_entry_id = "entry-1"
     sm.current_try = 1
 
-    await sm._post_drop_timeout(0)
+    await sm._run_timer("_state_timer", (TurnState.POST_DROP,), sm._post_drop_timeout)
 
     assert queue.completed == [("entry-1", "loss", 1)]
+
+
+@pytest.mark.anyio
+async def test_schedule_advance_coalesces_triggers():
+    sm = StateMachine(_DummyGPIO(), _DummyQueue(), _DummyWS(), _DummyCtrl(), _DummySettings())
+
+    calls = 0
+
+    async def fake_advance():
+        nonlocal calls
+        calls += 1
+
+    sm.advance_queue = fake_advance
+    for _ in range(5):
+        sm._schedule_advance()
+    await asyncio.sleep(0.05)
+
+    assert calls == 1
+    await sm.close()
+    assert sm._advancer_task is None
+
+
+@pytest.mark.anyio
+async def test_state_timer_is_lightweight_handle_until_it_fires():
+    settings = _DummySettings()
+    settings.try_move_seconds = 0.01
+    settings.drop_hold_max_ms = 10000
+
+    sm = StateMachine(_DummyGPIO(), _DummyQueue(), _DummyWS(), _DummyCtrl(), settings)
+    await sm._enter_state(TurnState.MOVING)
+    assert isinstance(sm._state_timer, asyncio.TimerHandle)
+
+    await asyncio.sleep(0.1)
+
+    assert sm.state == TurnState.DROPPING
+    sm._state_timer.cancel()
+
+
+def test_state_payload_uses_string_label():
+    sm = StateMachine(_DummyGPIO(), _DummyQueue(), _DummyWS(), _DummyCtrl(), _DummySettings())
+    sm.state = TurnState.READY_PROMPT
+
+    assert sm._build_state_payload()["state"] == "ready_prompt"
+    assert f"{TurnState.POST_DROP}" == "post_drop"
+
+
+def test_current_payload_reuses_cache_and_refreshes_timers():
+    sm = StateMachine(_DummyGPIO(), _DummyQueue(), _DummyWS(), _DummyCtrl(), _DummySettings())
+    sm.state = TurnState.MOVING
+    sm.active_entry_id = "p1"
+    sm.current_try = 1
+    sm._state_deadline = time.monotonic() + 10
+    cached = sm._cache_state_payload()
+
+    payload = sm.get_current_payload()
+    assert payload is not cached
+    assert payload["state"] == "moving"
+    assert 9.0 < payload["state_seconds_left"] <= 10.0
+
+    # A transition that bypassed _enter_state invalidates the cache.
+    sm.state = TurnState.IDLE
+    sm.active_entry_id = None
+    assert sm.get_current_payload()["state"] == "idle"
+
+
+def test_queued_seconds_accepts_sqlite_and_iso_formats():
+    from datetime import datetime, timedelta, timezone
+
+    ten_ago = datetime.now(timezone.utc) - timedelta(seconds=10)
+    for created in (
+        ten_ago.strftime("%Y-%m-%d %H:%M:%S"),          # SQLite datetime('now')
+        ten_ago.isoformat(),                            # explicit offset
+        ten_ago.strftime("%Y-%m-%dT%H:%M:%S") + "Z",    # Zulu suffix
+    ):
+        assert 9 <= StateMachine._queued_seconds({"created_at": created}) <= 12
+
+    assert StateMachine._queued_seconds({"created_at": "garbage"}) == 999
+    assert StateMachine._queued_seconds({"created_at": None}) == 999
+
+
+@pytest.mark.anyio
+async def test_timer_action_skipped_when_state_moved_on_and_recovers_on_crash():
+    sm = StateMachine(_DummyGPIO(), _DummyQueue(), _DummyWS(), _DummyCtrl(), _DummySettings())
+    sm.state = TurnState.MOVING
+    sm.active_entry_id = "entry-1"
+    calls = []
+
+    async def action():
+        calls.append(sm.state)
+        raise RuntimeError("boom")
+
+    # Stale timer: the state it was armed for is gone, so nothing runs.
+    await sm._run_timer("_state_timer", (TurnState.READY_PROMPT,), action)
+    assert calls == []
+
+    sm._state_timer = object()
+    await sm._run_timer("_state_timer", (TurnState.MOVING,), action)
+    assert calls == [TurnState.MOVING]
+    assert sm._state_timer is None
+    assert sm.state == TurnState.IDLE
+    assert sm.active_entry_id is None
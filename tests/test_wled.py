@@ -1,4 +1,5 @@
 import asyncio
+import json
 
 import httpx
 import pytest
@@ -21,8 +22,8 @@ class _FakeClient:
         self.fail_timeouts = fail_timeouts
         self.posts = []
 
-    async def post(self, url, json):
-        self.posts.append((url, json))
+    async def post(self, url, content, headers):
+        self.posts.append((url, json.loads(content)))
         if self.fail_timeouts > 0:
             self.fail_timeouts -= 1
             raise httpx.TimeoutException("timeout")
@@ -51,6 +52,7 @@ def _wled_settings(monkeypatch):
         "wled_result_display_seconds": 0.01,
         "wled_http_retries": 1,
         "wled_retry_backoff_seconds": 0.0,
+        "wled_dedup_window_ms": 100,
         "wled_connect_timeout_s": 2.0,
         "wled_read_timeout_s": 3.0,
         "wled_write_timeout_s": 2.0,
@@ -103,3 +105,92 @@ async def test_timeout_retry_succeeds(_wled_settings):
     assert ok is True
     assert len(fake.posts) == 2
     await client.close()
+
+
+@pytest.mark.anyio
+async def test_unsent_persistent_presets_coalesce(_wled_settings):
+    client = WLEDClient()
+    await client.start()
+    fake = _FakeClient()
+    client._client = fake
+
+    # Queued back to back without yielding, so the sender sees only the last.
+    await client.on_event("start_turn")
+    await client.on_event("idle")
+    await client.on_event("start_turn")
+    await asyncio.sleep(0.05)
+
+    presets = [payload["ps"] for _, payload in fake.posts]
+    assert presets == [14]
+    await client.close()
+
+
+@pytest.mark.anyio
+async def test_power_and_brightness_share_one_post(_wled_settings):
+    client = WLEDClient()
+    await client.start()
+    fake = _FakeClient()
+    client._client = fake
+
+    results = await asyncio.gather(client.set_on(True), client.set_brightness(100))
+
+    assert results == [True, True]
+    assert [payload for _, payload in fake.posts] == [{"on": True, "bri": 100}]
+    await client.close()
+
+
+@pytest.mark.anyio
+async def test_unconfigured_event_keeps_pending_revert(_wled_settings, monkeypatch):
+    monkeypatch.setattr(wled_mod.settings, "wled_preset_start_turn", 0)
+    client = WLEDClient()
+    await client.start()
+    fake = _FakeClient()
+    client._client = fake
+
+    await client.on_event("win")
+    await client.on_event("start_turn")  # no preset: must not cancel the revert
+    await asyncio.sleep(0.05)
+
+    presets = [payload["ps"] for _, payload in fake.posts]
+    assert presets == [11, 15]
+    await client.close()
+
+
+@pytest.mark.anyio
+async def test_refresh_settings_enables_at_runtime(_wled_settings, monkeypatch):
+    monkeypatch.setattr(wled_mod.settings, "wled_enabled", False)
+    client = WLEDClient()
+    await client.start()
+    fake = _FakeClient()
+    client._client = fake
+
+    assert not client.enabled
+    await client.on_event("start_turn")
+    await asyncio.sleep(0.01)
+    assert fake.posts == []
+
+    monkeypatch.setattr(wled_mod.settings, "wled_enabled", True)
+    client.refresh_settings()
+    await client.on_event("start_turn")
+    await asyncio.sleep(0.01)
+
+    assert [payload["ps"] for _, payload in fake.posts] == [14]
+    await client.close()
+
+
+@pytest.mark.anyio
+async def test_repeated_preset_within_window_is_skipped(_wled_settings, monkeypatch):
+    client = WLEDClient()
+    await client.start()
+    fake = _FakeClient()
+    client._client = fake
+
+    assert await client.trigger_preset(5) is True
+    assert await client.trigger_preset(5) is True
+    assert len(fake.posts) == 1
+
+    monkeypatch.setattr(wled_mod.settings, "wled_dedup_window_ms", 0)
+    client.refresh_settings()
+    assert await client.trigger_preset(5) is True
+    assert len(fake.posts) == 2
+    await client.close()